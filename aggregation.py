@@ -0,0 +1,140 @@
+# aggregation.py - Columnar aggregation of insect detections shared by all dashboard routes
+import json
+
+import numpy as np
+import pandas as pd
+
+ROLLUP_KEY = ["farmer_id", "device_id", "day", "insect"]
+
+
+def parse_detections(detections):
+    """Return detections as a dict, tolerating JSON strings and None"""
+    if isinstance(detections, str):
+        try:
+            detections = json.loads(detections)
+        except Exception:
+            detections = {}
+    if not isinstance(detections, dict):
+        detections = {}
+    return detections
+
+
+def to_count(value):
+    """Coerce a stored count ("5", 5.0, None, ...) to int, 0 when unusable"""
+    try:
+        return int(value)
+    except Exception:
+        try:
+            return int(float(value))
+        except Exception:
+            return 0
+
+
+def records_frame(records):
+    """
+    Explode raw insect_records into one row per (record, insect) with a positive count.
+    Columns: record (position in the input), timestamp (UTC), day (YYYY-MM-DD),
+    farmer_id, device_id ("" when not posted by a device), insect (categorical), count.
+    A "day" key on a record overrides the day derived from its timestamp. Rows whose timestamp can't
+    be parsed are kept (they still count towards their record's summary) with timestamp/day missing;
+    the per-day aggregations skip them.
+    """
+    record, stamps, days, farmers, devices, insects, counts = [], [], [], [], [], [], []
+    for i, r in enumerate(records):
+        stamp = r.get("timestamp")
+        day = r.get("day")
+        farmer_id = r.get("farmer_id") or ""
+        device_id = str(r.get("device_id") or "")
+        for insect, value in parse_detections(r.get("detections")).items():
+            c = to_count(value)
+            if c <= 0:
+                continue
+            record.append(i)
+            stamps.append(stamp)
+            days.append(day)
+            farmers.append(farmer_id)
+            devices.append(device_id)
+            insects.append(insect)
+            counts.append(c)
+
+    timestamp = pd.to_datetime(pd.Series(stamps, dtype=object), utc=True, errors="coerce", format="ISO8601")
+    day = pd.Series(days, dtype=object)
+    day = day.where(day.notna(), timestamp.dt.strftime("%Y-%m-%d"))
+    frame = pd.DataFrame({
+        "record": np.asarray(record, dtype=np.int64),
+        "timestamp": timestamp,
+        "day": day,
+        "farmer_id": farmers,
+        "device_id": devices,
+        "insect": pd.Categorical(insects),
+        "count": np.asarray(counts, dtype=np.int64),
+    })
+    return frame.assign(day=frame["day"].map(lambda d: str(d)[:10], na_action="ignore"))
+
+
+def rollup_frame(rows):
+    """Load insect_daily_rollup rows into the same columnar layout (no per-record columns)"""
+    frame = pd.DataFrame(list(rows), columns=ROLLUP_KEY + ["count"])
+    frame["day"] = frame["day"].astype(str).str[:10]
+    frame["device_id"] = frame["device_id"].fillna("").astype(str)
+    frame["insect"] = pd.Categorical(frame["insect"])
+    frame["count"] = pd.to_numeric(frame["count"], errors="coerce").fillna(0).astype(np.int64)
+    return frame
+
+
+def to_rollup_rows(frame):
+    """Sum a frame into rollup rows keyed by (farmer_id, device_id, day, insect)"""
+    # Rows whose timestamp couldn't be parsed have no day to aggregate under
+    frame = frame[frame["day"].notna()]
+    if frame.empty:
+        return []
+    grouped = frame.groupby(ROLLUP_KEY, observed=True, sort=False)["count"].sum().reset_index()
+    grouped["insect"] = grouped["insect"].astype(str)
+    return grouped.to_dict("records")
+
+
+def insect_totals(frame, insects=()):
+    """Per-insect totals; the given insect types are always present (in that order)"""
+    sums = frame.groupby("insect", observed=True)["count"].sum()
+    totals = {insect: 0 for insect in insects}
+    for insect, count in sums.items():
+        totals[str(insect)] = totals.get(str(insect), 0) + int(count)
+    return totals
+
+
+def top_insect(totals):
+    """(insect, count) with the highest total, ("N/A", 0) when nothing was detected"""
+    if not any(totals.values()):
+        return "N/A", 0
+    insect = max(totals, key=totals.get)
+    return insect, totals[insect]
+
+
+def daily_totals(frame):
+    """Total count per day, sorted by day: (labels, counts)"""
+    sums = frame.groupby("day", dropna=True)["count"].sum().sort_index()
+    return sums.index.tolist(), [int(c) for c in sums.tolist()]
+
+
+def daily_insect_series(frame, insects, days):
+    """{insect: [count per day in `days`]} for the given insect types (zero-filled)"""
+    table = frame.pivot_table(index="day", columns="insect", values="count", aggfunc="sum", observed=True)
+    table.columns = table.columns.astype(str)
+    table = table.reindex(index=days, columns=list(insects), fill_value=0).fillna(0).astype(np.int64)
+    return {insect: table[insect].tolist() for insect in insects}
+
+
+def record_summaries(frame, n_records):
+    """Per-record ("whiteflies:5, aphids:2", total) for the first n_records input records"""
+    labels = ["N/A"] * n_records
+    totals = [0] * n_records
+    if frame.empty:
+        return labels, totals
+    parts = frame["insect"].astype(str) + ":" + frame["count"].astype(str)
+    joined = parts.groupby(frame["record"], sort=False).agg(", ".join)
+    sums = frame.groupby("record", sort=False)["count"].sum()
+    for i, label in joined.items():
+        labels[i] = label
+    for i, total in sums.items():
+        totals[i] = int(total)
+    return labels, totals
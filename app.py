@@ -1,12 +1,26 @@
 # updated_app_py.py - JP Global InsectDetect with Professional Sidebar Navigation
-import os, base64, sqlite3, uuid, json
-from datetime import datetime, timedelta
+import os, base64, time, uuid, json
+from urllib.parse import quote
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
 from pathlib import Path
 from flask_cors import CORS
-from flask import Flask, request, redirect, url_for, render_template_string, session, flash, send_from_directory, jsonify
+from flask import Flask, request, redirect, url_for, render_template, session, flash, send_from_directory, jsonify, abort
 import pandas as pd
-from werkzeug.security import generate_password_hash, check_password_hash
+from jinja2 import DictLoader
+from werkzeug.security import check_password_hash
 from supabase import create_client
+from rollup import apply_rollup, load_rollup, rollup_rows
+from record_cache import RecordCache
+from ingest_queue import IngestQueue
+from users_dao import UsersDAO
+from dedupe import image_digest, ImageIndex, IdempotencyStore
+from derivatives import DERIVATIVE_SIZES, derivative_filename, make_derivatives
+from html_templates import TEMPLATES
+from assets import AssetManifest
+from aggregation import (records_frame, rollup_frame, insect_totals, top_insect, daily_totals,
+                         daily_insect_series, record_summaries, parse_detections)
 
 # Supabase Configuration
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -21,95 +35,27 @@ UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SESSION_SECRET", "replace_with_random_secret_in_prod")
+# Upper bound for device uploads (raw/multipart images are streamed to disk, not held in memory)
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_UPLOAD_MB", 25)) * 1024 * 1024
 CORS(app)
 
+# Page templates are compiled once per worker at startup and reused from the Jinja cache on every render
+app.jinja_loader = DictLoader(TEMPLATES)
+for template_name in TEMPLATES:
+    app.jinja_env.get_template(template_name)
 
-from flask import Flask, send_from_directory
+# Shared CSS / JS are served under content-hashed names (see asset()), referenced from templates via asset_url()
+ASSET_MAX_AGE = 365 * 24 * 3600
+assets = AssetManifest(APP_ROOT / "static", ["css/app.css", "js/app.js"])
+app.jinja_env.globals["asset_url"] = lambda name: url_for("asset", filename=assets.fingerprinted(name))
 
 
+from flask import Flask, send_from_directory
 
-# Database Helper Functions
-def init_users_db():
-    conn = sqlite3.connect(USERS_DB)
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-      id INTEGER PRIMARY KEY AUTOINCREMENT,
-      username TEXT UNIQUE,
-      password_hash TEXT,
-      role TEXT,
-      farmer_id TEXT
-    );
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS devices (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        device_name TEXT,
-        device_key TEXT UNIQUE,
-        farmer_id TEXT,
-        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-    );
-    """)
-    conn.commit()
-    conn.close()
-
-def create_sample_users():
-    init_users_db()
-    conn = sqlite3.connect(USERS_DB)
-    cur = conn.cursor()
-    try:
-        cur.execute("INSERT INTO users (username,password_hash,role,farmer_id) VALUES (?,?,?,?)",
-                    ("admin", generate_password_hash("admin123"), "admin", None))
-    except sqlite3.IntegrityError:
-        pass
-    try:
-        cur.execute("INSERT INTO users (username,password_hash,role,farmer_id) VALUES (?,?,?,?)",
-                    ("farmer1", generate_password_hash("pass123"), "farmer", "farmer_001"))
-    except sqlite3.IntegrityError:
-        pass
-    conn.commit()
-    conn.close()
-
-def get_user(username):
-    conn = sqlite3.connect(USERS_DB)
-    cur = conn.cursor()
-    cur.execute("SELECT id, username, password_hash, role, farmer_id FROM users WHERE username=?", (username,))
-    row = cur.fetchone()
-    conn.close()
-    return row
-
-def get_all_farmers():
-    conn = sqlite3.connect(USERS_DB)
-    cur = conn.cursor()
-    cur.execute("SELECT id, username, farmer_id FROM users WHERE role='farmer'")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def create_farmer(username, password, farmer_id):
-    conn = sqlite3.connect(USERS_DB)
-    cur = conn.cursor()
-    try:
-        cur.execute("INSERT INTO users (username,password_hash,role,farmer_id) VALUES (?,?,?,?)",
-                    (username, generate_password_hash(password), "farmer", farmer_id))
-        conn.commit()
-        conn.close()
-        return True
-    except sqlite3.IntegrityError:
-        conn.close()
-        return False
 
-# Device Management Functions
-def create_device(device_name, farmer_id):
-    conn = sqlite3.connect(USERS_DB)
-    cur = conn.cursor()
-    device_key = uuid.uuid4().hex + uuid.uuid4().hex
-    cur.execute("INSERT INTO devices (device_name, device_key, farmer_id) VALUES (?,?,?)", (device_name, device_key, farmer_id))
-    conn.commit()
-    cur.execute("SELECT id, device_key FROM devices WHERE device_key=?", (device_key,))
-    row = cur.fetchone()
-    conn.close()
-    return {"id": row[0], "device_key": row[1]}
+
+# Users / devices live in users.db, shared by all routes through one DAO (see users_dao.py)
+users_db = UsersDAO(USERS_DB)
 
 import traceback
 
@@ -127,119 +73,232 @@ def internal_error(error):
     print("="*60)
     return {"error": "Internal server error", "detail": str(error)}, 500
 
-def get_all_devices():
-    conn = sqlite3.connect(USERS_DB)
-    cur = conn.cursor()
-    cur.execute("SELECT id, device_name, device_key, farmer_id, created_at FROM devices ORDER BY created_at DESC")
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def get_farmer_devices(farmer_id):
-    conn = sqlite3.connect(USERS_DB)
-    cur = conn.cursor()
-    cur.execute("SELECT id, device_name, device_key, farmer_id, created_at FROM devices WHERE farmer_id=? ORDER BY created_at DESC", (farmer_id,))
-    rows = cur.fetchall()
-    conn.close()
-    return rows
-
-def get_device_by_key(device_key):
-    conn = sqlite3.connect(USERS_DB)
-    cur = conn.cursor()
-    cur.execute("SELECT id, device_name, device_key, farmer_id FROM devices WHERE device_key=?", (device_key,))
-    row = cur.fetchone()
-    conn.close()
-    return row
-
-def get_device_by_id(device_id):
-    conn = sqlite3.connect(USERS_DB)
-    cur = conn.cursor()
-    cur.execute("SELECT id, device_name, device_key, farmer_id FROM devices WHERE id=?", (device_id,))
-    row = cur.fetchone()
-    conn.close()
-    return row
-
-def regenerate_device_key(device_id):
-    conn = sqlite3.connect(USERS_DB)
-    cur = conn.cursor()
-    new_key = uuid.uuid4().hex + uuid.uuid4().hex
-    cur.execute("UPDATE devices SET device_key=? WHERE id=?", (new_key, device_id))
-    conn.commit()
-    conn.close()
-    return new_key
-
 # Supabase Data Functions
-def load_records(farmer_id=None, device_id=None):
+RECORDS_PAGE_SIZE = int(os.getenv("RECORDS_PAGE_SIZE", 50))
+
+# Query results are cached per (farmer_id, device_id, window); append_record invalidates them
+record_cache = RecordCache(maxsize=int(os.getenv("RECORD_CACHE_SIZE", 256)),
+                           ttl=int(os.getenv("RECORD_CACHE_TTL", 60)))
+
+# Storage folder listing for the admin image picker, one entry per page. upload_image_to_supabase drops the
+# first page (names sort newest first, so that's where a new image shows up); later pages expire by TTL
+image_list_cache = RecordCache(maxsize=16, ttl=int(os.getenv("IMAGE_LIST_TTL", 60)))
+IMAGE_BUCKET = "insect-images"
+IMAGE_PICKER_PAGE_SIZE = int(os.getenv("IMAGE_PICKER_PAGE_SIZE", 100))
+# Storage entries listed per picker page: every original can have one object per derivative size next to it
+IMAGE_LIST_PAGE_SIZE = IMAGE_PICKER_PAGE_SIZE * (1 + len(DERIVATIVE_SIZES))
+
+def load_records(farmer_id=None, device_id=None, columns="*"):
     """Load records from Supabase, optionally filtered by farmer_id or device_id"""
-    try:
+    def fetch():
+        query = supabase.table("insect_records").select(columns)
         if device_id:
-            res = supabase.table("insect_records").select("*").eq("device_id", str(device_id)).order("timestamp", desc=True).execute()
+            query = query.eq("device_id", str(device_id))
         elif farmer_id:
-            res = supabase.table("insect_records").select("*").eq("farmer_id", farmer_id).order("timestamp", desc=True).execute()
-        else:
-            res = supabase.table("insect_records").select("*").order("timestamp", desc=True).execute()
+            query = query.eq("farmer_id", farmer_id)
+        res = query.order("timestamp", desc=True).execute()
         return res.data or []
+    try:
+        return record_cache.get_or_load("records", farmer_id, device_id, columns, fetch)
     except Exception as e:
         print("Supabase load_records error:", e)
         return []
 
-def append_record(timestamp, farmer_id, detections_json, image_url, device_id=None):
-    """Append record to Supabase with detections stored as JSON"""
+def count_records(farmer_id=None, device_id=None):
+    """Count records server-side without transferring the rows"""
+    def fetch():
+        query = supabase.table("insect_records").select("id", count="exact")
+        if device_id:
+            query = query.eq("device_id", str(device_id))
+        elif farmer_id:
+            query = query.eq("farmer_id", farmer_id)
+        res = query.limit(1).execute()
+        return res.count or 0
     try:
-        record = {
-            "timestamp": timestamp,
-            "farmer_id": farmer_id,
-            "detections": detections_json,  # JSON object or string
-            "image_url": image_url
-        }
+        return record_cache.get_or_load("count", farmer_id, device_id, None, fetch)
+    except Exception as e:
+        print("Supabase count_records error:", e)
+        return 0
+
+def encode_cursor(record):
+    """Build an opaque keyset cursor from the (timestamp, id) of the last row on a page"""
+    raw = json.dumps([record.get("timestamp"), record.get("id")])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; returns (timestamp, id) or None for a missing/garbled cursor"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, record_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return str(timestamp), int(record_id)
+    except Exception:
+        return None
+
+def load_records_page(farmer_id=None, device_id=None, cursor=None, page_size=RECORDS_PAGE_SIZE, with_images=False):
+    """
+    Load one page of records, newest first, using keyset pagination on (timestamp, id).
+    Returns (records, next_cursor); next_cursor is None on the last page.
+    """
+    def fetch():
+        query = supabase.table("insect_records").select("*")
         if device_id:
-            record["device_id"] = str(device_id)
-        
-        supabase.table("insect_records").insert(record).execute()
+            query = query.eq("device_id", str(device_id))
+        if farmer_id:
+            query = query.eq("farmer_id", farmer_id)
+        if with_images:
+            # NULL <> '' is not true in Postgres, so this also drops rows without an image_url
+            query = query.neq("image_url", "")
+        position = decode_cursor(cursor)
+        if position:
+            ts, record_id = position
+            query = query.or_(f'timestamp.lt."{ts}",and(timestamp.eq."{ts}",id.lt.{record_id})')
+        # "timestamp.desc,id" + desc=True renders as order=timestamp.desc,id.desc (id breaks timestamp ties)
+        res = query.order("timestamp.desc,id", desc=True).limit(page_size + 1).execute()
+        return res.data or []
+    try:
+        rows = record_cache.get_or_load("page", farmer_id, device_id, (cursor or None, page_size, with_images), fetch)
     except Exception as e:
-        print(f"Error inserting record: {e}")
+        print("Supabase load_records_page error:", e)
+        return [], None
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
 
-def upload_image_to_supabase(filename: str, data: bytes):
-    """Upload image to Supabase storage"""
-    bucket = "insect-images"
+def append_records(records):
+    """Bulk-insert records in a single Supabase call, then update the rollup and cache; returns True once inserted"""
+    if not records:
+        return True
+    try:
+        supabase.table("insect_records").insert(records).execute()
+        # A failed rollup update is logged with the backfill_rollup.py command that reconciles it
+        apply_rollup(supabase, records)
+        for farmer_id, device_id in {(r.get("farmer_id"), r.get("device_id")) for r in records}:
+            record_cache.invalidate(farmer_id=farmer_id, device_id=device_id)
+        return True
+    except Exception as e:
+        print(f"Error inserting records: {e}")
+        return False
+
+def make_record(timestamp, farmer_id, detections_json, image_url, device_id=None, population=None,
+                thumb_url=None, medium_url=None):
+    """
+    Build an insect_records row with detections stored as JSON.
+    Tracking devices report new arrivals as detections and the insects currently on the trap as population.
+    thumb_url / medium_url are downscaled previews of image_url for galleries.
+    """
+    record = {
+        "timestamp": timestamp,
+        "farmer_id": farmer_id,
+        "detections": detections_json,  # JSON object or string
+        "image_url": image_url
+    }
+    if device_id:
+        record["device_id"] = str(device_id)
+    if population is not None:
+        record["population"] = population
+    if thumb_url:
+        record["thumb_url"] = thumb_url
+    if medium_url:
+        record["medium_url"] = medium_url
+    return record
+
+def append_record(timestamp, farmer_id, detections_json, image_url, device_id=None, population=None,
+                  thumb_url=None, medium_url=None):
+    """Append record to Supabase with detections stored as JSON; returns True once inserted"""
+    return append_records([make_record(timestamp, farmer_id, detections_json, image_url, device_id, population,
+                                       thumb_url, medium_url)])
+
+def parse_population(population):
+    """Validate an optional population ({insect: count} JSON object or string); raises ValueError"""
+    if population is None or population == "":
+        return None
+    if isinstance(population, str):
+        population = json.loads(population)
+    if not isinstance(population, dict):
+        raise ValueError("population must be a JSON object")
+    return population
+
+def public_image_url(file_path, bucket=IMAGE_BUCKET):
+    """Public URL of a storage object, built locally (same URL get_public_url returns, without the API call)"""
+    return f"{SUPABASE_URL.rstrip('/')}/storage/v1/object/public/{bucket}/{quote(file_path, safe='/')}"
+
+def upload_image_to_supabase(filename: str, data):
+    """Upload image to Supabase storage; data is bytes or the path of a local file (streamed from disk)"""
+    bucket = IMAGE_BUCKET
     file_path = f"insects/{filename}"
     
     try:
-        supabase.storage.from_(bucket).upload(file_path, data, {
-            "content-type": "image/jpeg"
-        })
-        public_url = supabase.storage.from_(bucket).get_public_url(file_path)
-        # result of get_public_url has structure {"publicURL": "..."} in some sdk versions; handle both
-        if isinstance(public_url, dict):
-            return public_url.get("publicURL") or public_url.get("public_url") or public_url.get("url")
-        return public_url
+        if isinstance(data, (bytes, bytearray)):
+            supabase.storage.from_(bucket).upload(file_path, data, {
+                "content-type": "image/jpeg"
+            })
+        else:
+            with open(data, "rb") as f:
+                supabase.storage.from_(bucket).upload(file_path, f, {
+                    "content-type": "image/jpeg"
+                })
+        image_list_cache.discard("images", None, None, (bucket, 0))
+        return public_image_url(file_path, bucket)
     except Exception as e:
         print(f"Upload error: {e}")
         return None
 
-def list_images_from_supabase():
-    """List all images from Supabase storage"""
-    bucket = "insect-images"
-    try:
-        files = supabase.storage.from_(bucket).list("insects/")
+def store_image(filename, data, digest=None):
+    """
+    Upload an image with its thumb / medium derivatives (stored next to it), unless identical bytes were
+    stored before (content-addressed by BLAKE2b digest) - duplicates are linked to the existing objects.
+    Returns {"image_url", "thumb_url", "medium_url"} (derivatives may be missing) or None on failure.
+    """
+    if digest:
+        urls = image_index.lookup(digest)
+        if urls:
+            return urls
+    image_url = upload_image_to_supabase(filename, data)
+    if not image_url:
+        return None
+    urls = {"image_url": image_url}
+    for kind, jpeg in make_derivatives(data).items():
+        derived_url = upload_image_to_supabase(derivative_filename(filename, kind), jpeg)
+        if derived_url:
+            urls[f"{kind}_url"] = derived_url
+    if digest:
+        image_index.remember(digest, f"insects/{filename}", urls)
+    return urls
+
+def list_images_from_supabase(offset=0):
+    """
+    One picker page of original images in the insects/ folder (newest names first), starting at storage
+    list position `offset`. Each original is stored next to its derivatives, so only the storage slice for
+    one page is requested (room for IMAGE_PICKER_PAGE_SIZE originals plus their derivatives) and these are
+    filtered out. Returns (images, next_offset or None). Public URLs are computed locally; each page is
+    cached for IMAGE_LIST_TTL seconds, so new uploads appear once it expires.
+    """
+    bucket = IMAGE_BUCKET
+    derived = tuple(f"_{kind}.jpg" for kind in DERIVATIVE_SIZES)
+    limit = IMAGE_LIST_PAGE_SIZE
+    
+    def fetch():
+        files = supabase.storage.from_(bucket).list("insects/", {
+            "limit": limit,
+            "offset": offset,
+            "sortBy": {"column": "name", "order": "desc"},
+        })
         image_list = []
         for file in files:
             filename = file['name']
-            if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
-                image_url = supabase.storage.from_(bucket).get_public_url(f"insects/{filename}")
-                # normalize structure
-                if isinstance(image_url, dict):
-                    url = image_url.get("publicURL") or image_url.get("public_url") or image_url.get("url")
-                else:
-                    url = image_url
+            if filename.lower().endswith(('.jpg', '.jpeg', '.png')) and not filename.endswith(derived):
                 image_list.append({
                     'filename': filename,
-                    'url': url
+                    'url': public_image_url(f"insects/{filename}", bucket)
                 })
-        return image_list
+        return image_list, (offset + len(files) if len(files) == limit else None)
+    
+    try:
+        return image_list_cache.get_or_load("images", None, None, (bucket, offset), fetch)
     except Exception as e:
         print(f"Error listing images: {e}")
-        return []
+        return [], None
 
 # Server-side normalization so templates that expect row.insect and row.count keep working
 def normalize_records(records):
@@ -248,57 +307,91 @@ def normalize_records(records):
       - record['insect']    : string summary like "whiteflies:5, aphids:2"
       - record['count']     : int total count
     """
-    out = []
-    for r in records:
-        rec = dict(r)  # shallow copy
-        detections = rec.get("detections", {})
-        # sometimes supabase returns JSON string; parse if necessary
-        if isinstance(detections, str):
-            try:
-                detections = json.loads(detections)
-            except:
-                detections = {}
-        # ensure dict
-        if not isinstance(detections, dict):
-            detections = {}
-        # create summary and count
-        parts = []
-        total = 0
-        for k, v in detections.items():
-            try:
-                c = int(v)
-            except:
-                try:
-                    c = int(float(v))
-                except:
-                    c = 0
-            if c > 0:
-                parts.append(f"{k}:{c}")
-                total += c
-        rec['insect'] = ", ".join(parts) if parts else "N/A"
-        rec['count'] = total
-        out.append(rec)
-    return out
+    labels, totals = record_summaries(records_frame(records), len(records))
+    return [dict(r, insect=label, count=total) for r, label, total in zip(records, labels, totals)]
+
+INSECT_TYPES = ["whiteflies", "aphids", "thrips", "beetle", "fungus gnats"]
+
+def load_insect_rollup(farmer_id=None, device_id=None, since_day=None):
+    """Rollup rows for the dashboards; rebuilt from raw records if the rollup table is unavailable"""
+    def fetch():
+        rows = load_rollup(supabase, farmer_id=farmer_id, device_id=device_id, since_day=since_day)
+        if rows is not None:
+            return rows
+        records = load_records(farmer_id=farmer_id, device_id=device_id,
+                               columns="timestamp,farmer_id,device_id,detections")
+        rows = rollup_rows(records)
+        if since_day:
+            rows = [r for r in rows if r["day"] >= since_day]
+        return rows
+    return record_cache.get_or_load("rollup", farmer_id, device_id, since_day, fetch)
+
+def summarize_insects(rows):
+    """Per-insect totals with the known insect types always present (in display order)"""
+    return insect_totals(rollup_frame(rows), INSECT_TYPES)
+
+def page_urls(endpoint, next_cursor, **filters):
+    """Links for the first page and the next (older) page, keeping the active filters"""
+    filters = {k: v for k, v in filters.items() if v}
+    return {
+        "first_page_url": url_for(endpoint, **filters),
+        "next_page_url": url_for(endpoint, cursor=next_cursor, **filters) if next_cursor else None,
+    }
 
 # Session Management
-def login_user(username):
-    session['username'] = username
+# The signed session cookie carries the user's identity, so current_user() needs no database query.
+# It is re-checked against users.db this often (seconds) to pick up role changes and deleted users.
+SESSION_REVALIDATE = int(os.getenv("SESSION_REVALIDATE", 300))
+
+def _session_identity(row):
+    user_id, username, role, farmer_id, version = row
+    return {"id": user_id, "username": username, "role": role, "farmer_id": farmer_id, "version": version,
+            "checked": int(time.time())}
+
+def login_user(user_id):
+    session.pop('username', None)
+    session['user'] = _session_identity(users_db.get_identity(user_id))
 
 def current_user():
-    uname = session.get('username')
-    if not uname:
-        return None
-    row = get_user(uname)
-    if not row:
-        return None
-    return {"id": row[0], "username": row[1], "role": row[3], "farmer_id": row[4]}
+    identity = session.get('user')
+    if not identity:
+        # Sessions issued before the identity was embedded only hold the username
+        row = users_db.get_user(session['username']) if session.get('username') else None
+        if not row:
+            return None
+        login_user(row[0])
+        identity = session['user']
+    elif time.time() - identity.get("checked", 0) >= SESSION_REVALIDATE:
+        row = users_db.get_identity(identity["id"])
+        if not row:
+            logout_user()
+            return None
+        if row[4] != identity.get("version"):
+            identity = _session_identity(row)
+        else:
+            identity = {**identity, "checked": int(time.time())}
+        session['user'] = identity
+    return {key: identity[key] for key in ("id", "username", "role", "farmer_id")}
 
 def logout_user():
+    session.pop('user', None)
     session.pop('username', None)
 
 # Initialize Database
-init_users_db()
-create_sample_users()
+users_db.create_sample_users()
+
+# Re-sent images and retried requests are recognised instead of stored twice
+image_index = ImageIndex(users_db)
+idempotency = IdempotencyStore(users_db)
+
+# Device image uploads are acknowledged immediately and pushed to storage by a worker pool
+ingest_queue = IngestQueue(db=users_db,
+                           spool_dir=UPLOAD_FOLDER / "spool",
+                           upload=store_image,
+                           write_record=append_record,
+                           workers=int(os.getenv("INGEST_WORKERS", 2)),
+                           max_attempts=int(os.getenv("INGEST_MAX_ATTEMPTS", 4)))
+ingest_queue.start(interval=int(os.getenv("INGEST_RESUME_INTERVAL", 60)))
 
 # Routes
 @app.route("/")
@@ -315,9 +408,9 @@ def login():
     if request.method == "POST":
         username = request.form.get("username")
         password = request.form.get("password")
-        user = get_user(username)
+        user = users_db.get_user(username)
         if user and check_password_hash(user[2], password):
-            login_user(username)
+            login_user(user[0])
             if user[3] == "admin":
                 return redirect(url_for("admin_overview"))
             else:
@@ -325,8 +418,7 @@ def login():
         else:
             flash("Invalid credentials", "danger")
     
-    from html_templates import LOGIN_HTML
-    return render_template_string(LOGIN_HTML)
+    return render_template("login.html")
 
 @app.route("/logout")
 def logout():
@@ -341,43 +433,24 @@ def admin_overview():
     if not user or user['role'] != 'admin':
         return redirect(url_for("login"))
     
-    records = load_records()
-    devices = get_all_devices()
-    farmers = get_all_farmers()
+    devices = users_db.get_all_devices()
+    farmers = users_db.get_all_farmers()
     
-    total_detections = len(records)
+    total_detections = count_records()
     total_devices = len(devices)
     total_farmers = len(farmers)
     
-    # Parse detections and calculate totals
-    insect_totals = {"whiteflies": 0, "aphids": 0, "thrips": 0, "beetle": 0, "fungus gnats": 0}
-    total_insects = 0
+    totals = summarize_insects(load_insect_rollup())
+    total_insects = sum(totals.values())
+    insect_summary = [{"insect": k, "count": v} for k, v in totals.items() if v > 0]
     
-    for record in records:
-        detections = record.get("detections", {})
-        if detections is None:
-            try:
-                detections = json.loads(detections)
-            except:
-                detections = {}
-        for insect, count in detections.items():
-            try:
-                c = int(count)
-            except:
-                c = 0
-            insect_totals[insect] = insect_totals.get(insect, 0) + c
-            total_insects += c
-    
-    insect_summary = [{"insect": k, "count": v} for k, v in insect_totals.items() if v > 0]
-    
-    from html_templates import ADMIN_OVERVIEW_HTML
-    return render_template_string(ADMIN_OVERVIEW_HTML, 
-                                   username=user['username'],
-                                   total_detections=total_detections,
-                                   total_devices=total_devices,
-                                   total_farmers=total_farmers,
-                                   total_insects=total_insects,
-                                   insect_summary=insect_summary)
+    return render_template("admin_overview.html",
+                           username=user['username'],
+                           total_detections=total_detections,
+                           total_devices=total_devices,
+                           total_farmers=total_farmers,
+                           total_insects=total_insects,
+                           insect_summary=insect_summary)
 
 @app.route("/admin/devices")
 def admin_devices():
@@ -385,14 +458,13 @@ def admin_devices():
     if not user or user['role'] != 'admin':
         return redirect(url_for("login"))
     
-    devices = get_all_devices()
-    farmers = get_all_farmers()
+    devices = users_db.get_all_devices()
+    farmers = users_db.get_all_farmers()
     
-    from html_templates import ADMIN_DEVICES_HTML
-    return render_template_string(ADMIN_DEVICES_HTML, 
-                                   username=user['username'],
-                                   devices=devices,
-                                   farmers=farmers)
+    return render_template("admin_devices.html",
+                           username=user['username'],
+                           devices=devices,
+                           farmers=farmers)
 
 @app.route("/admin/device/<int:device_id>/analytics")
 def admin_device_analytics(device_id):
@@ -400,40 +472,25 @@ def admin_device_analytics(device_id):
     if not user or user['role'] != 'admin':
         return redirect(url_for("login"))
     
-    device = get_device_by_id(device_id)
+    device = users_db.get_device_by_id(device_id)
     if not device:
         flash("Device not found", "danger")
         return redirect(url_for("admin_devices"))
     
-    records = load_records(device_id=device_id)
-    
-    # parse detections for summary
-    insect_totals = {"whiteflies": 0, "aphids": 0, "thrips": 0, "beetle": 0, "fungus gnats": 0}
-    for record in records:
-        detections = record.get("detections", {})
-        if isinstance(detections, str):
-            try:
-                detections = json.loads(detections)
-            except:
-                detections = {}
-        for insect, count in detections.items():
-            try:
-                c = int(count)
-            except:
-                c = 0
-            insect_totals[insect] = insect_totals.get(insect, 0) + c
-    
-    summary = [{"insect": k, "count": v} for k, v in insect_totals.items() if v > 0]
+    # The page only lists the 20 most recent records; totals come from the rollup
+    records, _ = load_records_page(device_id=device_id, page_size=20)
+    totals = summarize_insects(load_insect_rollup(device_id=device_id))
+    summary = [{"insect": k, "count": v} for k, v in totals.items() if v > 0]
     
     # normalize for template compatibility
     records_normalized = normalize_records(records)
     
-    from html_templates import ADMIN_DEVICE_ANALYTICS_HTML
-    return render_template_string(ADMIN_DEVICE_ANALYTICS_HTML,
-                                   username=user['username'],
-                                   device=device,
-                                   records=records_normalized,
-                                   summary=summary)
+    return render_template("admin_device_analytics.html",
+                           username=user['username'],
+                           device=device,
+                           records=records_normalized,
+                           total_detections=count_records(device_id=device_id),
+                           summary=summary)
 
 @app.route("/admin/dataset")
 def admin_dataset():
@@ -441,22 +498,20 @@ def admin_dataset():
     if not user or user['role'] != 'admin':
         return redirect(url_for("login"))
     
-    farmers = get_all_farmers()
+    farmers = users_db.get_all_farmers()
     selected_farmer = request.args.get("farmer_id", "")
+    cursor = request.args.get("cursor", "")
     
-    if selected_farmer:
-        records = load_records(farmer_id=selected_farmer)
-    else:
-        records = load_records()
-    
+    records, next_cursor = load_records_page(farmer_id=selected_farmer or None, cursor=cursor)
     records_normalized = normalize_records(records)
     
-    from html_templates import ADMIN_DATASET_HTML
-    return render_template_string(ADMIN_DATASET_HTML,
-                                   username=user['username'],
-                                   records=records_normalized,
-                                   farmers=farmers,
-                                   selected_farmer=selected_farmer)
+    return render_template("admin_dataset.html",
+                           username=user['username'],
+                           records=records_normalized,
+                           farmers=farmers,
+                           selected_farmer=selected_farmer,
+                           cursor=cursor,
+                           **page_urls("admin_dataset", next_cursor, farmer_id=selected_farmer))
 
 @app.route("/admin/images")
 def admin_images():
@@ -464,28 +519,31 @@ def admin_images():
     if not user or user['role'] != 'admin':
         return redirect(url_for("login"))
     
-    farmers = get_all_farmers()
+    farmers = users_db.get_all_farmers()
     selected_farmer = request.args.get("farmer_id", "")
+    cursor = request.args.get("cursor", "")
     
-    if selected_farmer:
-        records = load_records(farmer_id=selected_farmer)
-    else:
-        records = load_records()
-    
-    # Filter records with images only
-    records_with_images = [r for r in records if r.get("image_url")]
-    records_normalized = normalize_records(records_with_images)
-    
-    # list available images from supabase storage for linking (used by admin form)
-    available_images = list_images_from_supabase()
+    # Only records with images, filtered server-side
+    records, next_cursor = load_records_page(farmer_id=selected_farmer or None, cursor=cursor, with_images=True)
+    records_normalized = normalize_records(records)
     
-    from html_templates import ADMIN_IMAGES_HTML
-    return render_template_string(ADMIN_IMAGES_HTML,
-                                   username=user['username'],
-                                   records=records_normalized,
-                                   farmers=farmers,
-                                   selected_farmer=selected_farmer,
-                                   available_images=available_images)
+    # list available images from supabase storage for linking (used by admin form), one picker page at a time
+    image_offset = max(request.args.get("image_offset", 0, type=int), 0)
+    available_images, next_image_offset = list_images_from_supabase(image_offset)
+    image_filters = {k: v for k, v in {"farmer_id": selected_farmer, "cursor": cursor}.items() if v}
+    
+    return render_template("admin_images.html",
+                           username=user['username'],
+                           records=records_normalized,
+                           farmers=farmers,
+                           selected_farmer=selected_farmer,
+                           available_images=available_images,
+                           newer_images_url=url_for("admin_images", image_offset=max(image_offset - IMAGE_LIST_PAGE_SIZE, 0),
+                                                    **image_filters) if image_offset else None,
+                           older_images_url=url_for("admin_images", image_offset=next_image_offset, **image_filters)
+                                            if next_image_offset else None,
+                           cursor=cursor,
+                           **page_urls("admin_images", next_cursor, farmer_id=selected_farmer))
 
 @app.route("/admin/users")
 def admin_users():
@@ -493,12 +551,11 @@ def admin_users():
     if not user or user['role'] != 'admin':
         return redirect(url_for("login"))
     
-    farmers = get_all_farmers()
+    farmers = users_db.get_all_farmers()
     
-    from html_templates import ADMIN_USERS_HTML
-    return render_template_string(ADMIN_USERS_HTML,
-                                   username=user['username'],
-                                   farmers=farmers)
+    return render_template("admin_users.html",
+                           username=user['username'],
+                           farmers=farmers)
 
 @app.route("/admin/create_farmer", methods=["POST"])
 def admin_create_farmer():
@@ -514,7 +571,7 @@ def admin_create_farmer():
         flash("All fields are required", "danger")
         return redirect(url_for("admin_users"))
     
-    success = create_farmer(username, password, farmer_id)
+    success = users_db.create_farmer(username, password, farmer_id)
     if success:
         flash(f"Farmer account created: {username}", "success")
     else:
@@ -535,7 +592,7 @@ def admin_create_device():
         flash("Device name and farmer required", "danger")
         return redirect(url_for("admin_devices"))
     
-    res = create_device(device_name, farmer_id)
+    res = users_db.create_device(device_name, farmer_id)
     flash(f"Device created: {device_name} | Key: {res['device_key']}", "success")
     return redirect(url_for("admin_devices"))
 
@@ -550,10 +607,27 @@ def admin_regenerate_key():
         flash("device_id required", "danger")
         return redirect(url_for("admin_devices"))
     
-    new_key = regenerate_device_key(device_id)
+    new_key = users_db.regenerate_device_key(device_id)
     flash(f"Key regenerated. New key: {new_key}", "success")
     return redirect(url_for("admin_devices"))
 
+@app.route("/admin/delete_device", methods=["POST"])
+def admin_delete_device():
+    user = current_user()
+    if not user or user['role'] != 'admin':
+        return redirect(url_for("login"))
+
+    device_id = request.form.get("device_id")
+    if not device_id:
+        flash("device_id required", "danger")
+        return redirect(url_for("admin_devices"))
+
+    if users_db.delete_device(device_id):
+        flash("Device deleted. Its key no longer accepts uploads.", "success")
+    else:
+        flash("Device not found", "danger")
+    return redirect(url_for("admin_devices"))
+
 @app.route("/admin/create_record_for_image", methods=["POST"])
 def admin_create_record_for_image():
     user = current_user()
@@ -594,42 +668,22 @@ def farmer_overview():
     if not user or user['role'] != 'farmer':
         return redirect(url_for("login"))
     
-    records = load_records(farmer_id=user['farmer_id'])
-    
-    # Parse detections
-    insect_totals = {"whiteflies": 0, "aphids": 0, "thrips": 0, "beetle": 0, "fungus gnats": 0}
-    total_count = 0
-    
-    for record in records:
-        detections = record.get("detections", {})
-        if isinstance(detections, str):
-            try:
-                detections = json.loads(detections)
-            except:
-                detections = {}
-        for insect, count in detections.items():
-            try:
-                c = int(count)
-            except:
-                c = 0
-            insect_totals[insect] = insect_totals.get(insect, 0) + c
-            total_count += c
+    totals = summarize_insects(load_insect_rollup(farmer_id=user['farmer_id']))
+    total_count = sum(totals.values())
     
     # Find top insect
-    top_insect = max(insect_totals, key=insect_totals.get) if any(insect_totals.values()) else "N/A"
-    top_count = insect_totals.get(top_insect, 0)
+    top_name, top_count = top_insect(totals)
     
-    insect_summary = [{"insect": k, "count": v} for k, v in insect_totals.items() if v > 0]
+    insect_summary = [{"insect": k, "count": v} for k, v in totals.items() if v > 0]
     
-    from html_templates import FARMER_OVERVIEW_HTML
-    return render_template_string(FARMER_OVERVIEW_HTML,
-                                   username=user['username'],
-                                   farmer_id=user['farmer_id'],
-                                   total_detections=len(records),
-                                   total_count=total_count,
-                                   top_insect=top_insect,
-                                   top_count=top_count,
-                                   insect_summary=insect_summary)
+    return render_template("farmer_overview.html",
+                           username=user['username'],
+                           farmer_id=user['farmer_id'],
+                           total_detections=count_records(farmer_id=user['farmer_id']),
+                           total_count=total_count,
+                           top_insect=top_name,
+                           top_count=top_count,
+                           insect_summary=insect_summary)
 
 
 
@@ -640,14 +694,10 @@ def farmer_analysis():
     if not user or user['role'] != 'farmer':
         return redirect(url_for("login"))
     
-    records = load_records(farmer_id=user['farmer_id'])
-    records_normalized = normalize_records(records)
-    
-    from html_templates import FARMER_ANALYSIS_HTML
-    return render_template_string(FARMER_ANALYSIS_HTML,
-                                   username=user['username'],
-                                   farmer_id=user['farmer_id'],
-                                   records=records_normalized)
+    # The charts are filled in from /api/analysis_data; the page itself needs no records
+    return render_template("farmer_analysis.html",
+                           username=user['username'],
+                           farmer_id=user['farmer_id'])
 
 @app.route("/farmer/dataset")
 def farmer_dataset():
@@ -655,22 +705,24 @@ def farmer_dataset():
     if not user or user['role'] != 'farmer':
         return redirect(url_for("login"))
     
-    devices = get_farmer_devices(user['farmer_id'])
+    devices = users_db.get_farmer_devices(user['farmer_id'])
     selected_device = request.args.get("device_id", "")
+    cursor = request.args.get("cursor", "")
     
-    if selected_device:
-        records = load_records(device_id=selected_device)
-    else:
-        records = load_records(farmer_id=user['farmer_id'])
+    # Guard against browsing another farmer's device by id
+    if selected_device and selected_device not in [str(d[0]) for d in devices]:
+        selected_device = ""
     
+    records, next_cursor = load_records_page(farmer_id=user['farmer_id'], device_id=selected_device or None, cursor=cursor)
     records_normalized = normalize_records(records)
     
-    from html_templates import FARMER_DATASET_HTML
-    return render_template_string(FARMER_DATASET_HTML,
-                                   username=user['username'],
-                                   records=records_normalized,
-                                   devices=devices,
-                                   selected_device=selected_device)
+    return render_template("farmer_dataset.html",
+                           username=user['username'],
+                           records=records_normalized,
+                           devices=devices,
+                           selected_device=selected_device,
+                           cursor=cursor,
+                           **page_urls("farmer_dataset", next_cursor, device_id=selected_device))
 
 @app.route("/farmer/images")
 def farmer_images():
@@ -678,142 +730,102 @@ def farmer_images():
     if not user or user['role'] != 'farmer':
         return redirect(url_for("login"))
     
-    devices = get_farmer_devices(user['farmer_id'])
+    devices = users_db.get_farmer_devices(user['farmer_id'])
     selected_device = request.args.get("device_id", "")
+    cursor = request.args.get("cursor", "")
     
-    if selected_device:
-        records = load_records(device_id=selected_device)
-    else:
-        records = load_records(farmer_id=user['farmer_id'])
+    if selected_device and selected_device not in [str(d[0]) for d in devices]:
+        selected_device = ""
     
-    # Filter records with images only
-    records_with_images = [r for r in records if r.get("image_url")]
-    records_normalized = normalize_records(records_with_images)
+    # Only records with images, filtered server-side
+    records, next_cursor = load_records_page(farmer_id=user['farmer_id'], device_id=selected_device or None,
+                                             cursor=cursor, with_images=True)
+    records_normalized = normalize_records(records)
     
-    from html_templates import FARMER_IMAGES_HTML
-    return render_template_string(FARMER_IMAGES_HTML,
-                                   username=user['username'],
-                                   records=records_normalized,
-                                   devices=devices,
-                                   selected_device=selected_device)
+    return render_template("farmer_images.html",
+                           username=user['username'],
+                           records=records_normalized,
+                           devices=devices,
+                           selected_device=selected_device,
+                           cursor=cursor,
+                           **page_urls("farmer_images", next_cursor, device_id=selected_device))
 
 # ==================== API ROUTES ====================
 # Add this import at the top of app.py
 from dateutil import parser as date_parser
 
-# Replace the api_analysis_data function
+def parse_timestamp(value):
+    """Parse a Supabase ISO 8601 timestamp to an aware UTC datetime (None if unparseable)"""
+    try:
+        ts = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        try:
+            ts = date_parser.parse(value)
+        except Exception:
+            return None
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc)
+
+def load_analysis_rows(farmer_id, days):
+    """Rollup rows covering the last `days` days of a farmer's detections (cached per farmer and window)"""
+    def fetch():
+        # Calculate cutoff date
+        cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
+
+        # Per-day totals come from the rollup (whole days from the cutoff day onwards)
+        rows = load_rollup(supabase, farmer_id=farmer_id, since_day=cutoff_date.strftime("%Y-%m-%d"))
+        if rows is not None:
+            return rows
+
+        # Rollup table unavailable - rebuild the same rows from the raw records in the window only
+        db = supabase.table("insect_records") \
+            .select("timestamp,farmer_id,device_id,detections") \
+            .eq("farmer_id", farmer_id) \
+            .gte("timestamp", cutoff_date.isoformat()) \
+            .execute()
+        records = db.data or []
+
+        # Parse each timestamp once and keep its UTC day for the aggregation
+        dated = []
+        for r in records:
+            ts = parse_timestamp(r.get("timestamp"))
+            if ts is None:
+                print(f"Error parsing timestamp: {r.get('timestamp')!r}")
+                continue
+            dated.append(dict(r, day=ts.date().isoformat()))
+        return rollup_rows(dated)
+    return record_cache.get_or_load("analysis", farmer_id, None, days, fetch)
+
 @app.route("/api/analysis_data")
 def api_analysis_data():
     farmer_id = request.args.get("farmer_id")
     days = int(request.args.get("days", 7))
 
-    # Fetch records from Supabase
+    empty = {
+        "labels": [],
+        "bar_data": [],
+        "line_labels": [],
+        "line_datasets": []
+    }
     try:
-        db = supabase.table("insect_records") \
-            .select("*") \
-            .eq("farmer_id", farmer_id) \
-            .order("timestamp", desc=False) \
-            .execute()
-        
-        records = db.data or []
+        rows = load_analysis_rows(farmer_id, days)
     except Exception as e:
         print(f"Error fetching analysis data: {e}")
-        return jsonify({
-            "labels": [],
-            "bar_data": [],
-            "line_labels": [],
-            "line_datasets": []
-        })
-
-    if not records:
-        return jsonify({
-            "labels": [],
-            "bar_data": [],
-            "line_labels": [],
-            "line_datasets": []
-        })
-
-    # Calculate cutoff date
-    from datetime import timezone
-    cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
+        return jsonify(empty)
 
-    # Filter records by date
-    filtered = []
-    for r in records:
-        try:
-            # Parse ISO 8601 timestamp from Supabase
-            ts = date_parser.parse(r["timestamp"])
-            if ts >= cutoff_date:
-                filtered.append(r)
-        except Exception as e:
-            print(f"Error parsing timestamp: {e}")
-            continue
+    if not rows:
+        return jsonify(empty)
 
-    if not filtered:
-        return jsonify({
-            "labels": [],
-            "bar_data": [],
-            "line_labels": [],
-            "line_datasets": []
-        })
+    frame = rollup_frame(rows)
+    insect_types = INSECT_TYPES
 
     # Prepare data for BAR CHART (total counts per day)
-    daily_totals = {}
-    for r in filtered:
-        date_str = date_parser.parse(r["timestamp"]).strftime("%Y-%m-%d")
-        detections = r.get("detections", {})
-        
-        # Handle if detections is stored as string
-        if isinstance(detections, str):
-            try:
-                detections = json.loads(detections)
-            except:
-                detections = {}
-        
-        # Sum all insects for that day
-        day_total = 0
-        for insect, count in detections.items():
-            try:
-                day_total += int(count)
-            except:
-                pass
-        
-        if date_str not in daily_totals:
-            daily_totals[date_str] = 0
-        daily_totals[date_str] += day_total
-
-    bar_labels = sorted(daily_totals.keys())
-    bar_data = [daily_totals[label] for label in bar_labels]
+    bar_labels, bar_data = daily_totals(frame)
 
     # Prepare data for LINE CHART (individual insect trends)
-    insect_types = ["whiteflies", "aphids", "thrips", "beetle", "fungus gnats"]
-    daily_insect_data = {insect: {} for insect in insect_types}
-    
-    for r in filtered:
-        date_str = date_parser.parse(r["timestamp"]).strftime("%Y-%m-%d")
-        detections = r.get("detections", {})
-        
-        if isinstance(detections, str):
-            try:
-                detections = json.loads(detections)
-            except:
-                detections = {}
-        
-        for insect in insect_types:
-            if date_str not in daily_insect_data[insect]:
-                daily_insect_data[insect][date_str] = 0
-            
-            count = detections.get(insect, 0)
-            try:
-                daily_insect_data[insect][date_str] += int(count)
-            except:
-                pass
-
-    # Get all unique dates and sort them
-    all_dates = set()
-    for insect_data in daily_insect_data.values():
-        all_dates.update(insect_data.keys())
-    line_labels = sorted(all_dates)
+    line_labels = bar_labels
+    insect_series = daily_insect_series(frame, insect_types, line_labels)
 
     # Create line chart datasets
     colors = {
@@ -826,10 +838,9 @@ def api_analysis_data():
     
     line_datasets = []
     for insect in insect_types:
-        data = [daily_insect_data[insect].get(label, 0) for label in line_labels]
         line_datasets.append({
             "label": insect.title(),
-            "data": data,
+            "data": insect_series[insect],
             "borderColor": colors[insect]["border"],
             "backgroundColor": colors[insect]["bg"],
             "borderWidth": 2,
@@ -838,7 +849,7 @@ def api_analysis_data():
         })
 
     print(f"Analysis API - Farmer: {farmer_id}, Days: {days}")
-    print(f"Filtered records: {len(filtered)}")
+    print(f"Rollup rows: {len(rows)}")
     print(f"Bar labels: {bar_labels}")
     print(f"Bar data: {bar_data}")
     print(f"Line labels: {line_labels}")
@@ -870,55 +881,265 @@ def debug_analysis(farmer_id):
     return jsonify(debug_data)
 
 
+def idempotent(view):
+    """
+    Honour an Idempotency-Key header on device upload routes: the first successful response for a
+    (device, key) pair is stored and replayed to retries, so a timed-out upload can be re-sent safely.
+    Only 200/202 are stored; anything else (errors, 207 partial batches) frees the key for a real retry.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        device = users_db.get_device_by_key(request.headers.get("Device-Key")) if key else None
+        if not device:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return {"error": "Idempotency-Key too long"}, 400
+        
+        scope = f"{request.endpoint}:{device[0]}"
+        stored = idempotency.begin(scope, key)
+        if stored is not None:
+            status_code, body = stored
+            if status_code is None:
+                return {"error": "a request with this Idempotency-Key is still in progress"}, 409
+            response = app.response_class(body, status=status_code, mimetype="application/json")
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+        
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except Exception:
+            idempotency.release(scope, key)
+            raise
+        if response.status_code in (200, 202):
+            idempotency.complete(scope, key, response.status_code, response.get_data(as_text=True))
+        else:
+            idempotency.release(scope, key)
+        return response
+    return wrapper
+
 @app.route('/api/upload_result', methods=['POST'])
+@idempotent
 def upload_result():
-    """Device upload endpoint with device key authentication - supports multiple insect detections"""
+    """
+    Device upload endpoint with device key authentication - supports multiple insect detections.
+    Accepted bodies:
+      - application/json:    {"detections": {...}, "population": {...}, "image_base64": "..."}
+      - multipart/form-data: "detections" (and "population") JSON fields + "image" file part
+      - image/jpeg:          raw JPEG body, detections JSON in the X-Detections header (X-Population)
+    detections are the insects counted in this capture (new arrivals on tracking devices); the
+    optional population is the standing count on the trap.
+    Records without an image are written immediately (200). Images are spooled and uploaded in
+    the background (202 with a job_id; poll /api/upload_status/<job_id>); an image whose bytes were
+    stored before is linked rather than uploaded again. Retries may send an Idempotency-Key header.
+    """
     device_key = request.headers.get("Device-Key")
     if not device_key:
         return {"error": "Device-Key header missing"}, 400
     
-    device = get_device_by_key(device_key)
+    device = users_db.get_device_by_key(device_key)
     if not device:
         return {"error": "invalid device_key"}, 403
     
     device_id = device[0]
     farmer_id = device[3]
     
-    data = request.get_json(silent=True)
-    if not data:
-        return {"error": "invalid or missing JSON"}, 400
+    # Binary modes keep the image out of JSON; it is streamed from the request straight to the spool
+    image = None
+    if request.mimetype == "multipart/form-data":
+        detections = request.form.get("detections", "{}")
+        population = request.form.get("population")
+        upload = request.files.get("image")
+        if upload is not None:
+            image = upload.stream
+    elif request.mimetype in ("image/jpeg", "application/octet-stream"):
+        detections = request.headers.get("X-Detections", "{}")
+        population = request.headers.get("X-Population")
+        image = request.stream
+    else:
+        data = request.get_json(silent=True)
+        if not data:
+            return {"error": "invalid or missing JSON"}, 400
+        detections = data.get("detections", {})
+        population = data.get("population")
+        image_b64 = data.get("image_base64") or data.get("image_b64")
+        if image_b64:
+            try:
+                image = base64.b64decode(image_b64, validate=True)
+            except Exception as e:
+                return {"error": "invalid image_base64", "detail": str(e)}, 400
     
     # Expect detections as JSON object: {"whiteflies": 5, "aphids": 2, "thrips": 3}
-    detections = data.get("detections", {})
+    if isinstance(detections, str):
+        try:
+            detections = json.loads(detections)
+        except ValueError:
+            return {"error": "detections must be a JSON object"}, 400
     if not isinstance(detections, dict):
         return {"error": "detections must be a JSON object"}, 400
+    try:
+        population = parse_population(population)
+    except ValueError:
+        return {"error": "population must be a JSON object"}, 400
     
-    image_b64 = data.get("image_base64") or data.get("image_b64")
     timestamp = datetime.utcnow().isoformat()
     
-    image_url = ""
-    if image_b64:
+    if image is not None:
         filename = f"{timestamp.replace(':', '-')}_{farmer_id}.jpg"
-        try:
-            file_bytes = base64.b64decode(image_b64)
-            image_url = upload_image_to_supabase(filename, file_bytes)
-            if not image_url:
-                return {"error": "image upload failed"}, 500
-        except Exception as e:
-            return {"error": "image upload failed", "detail": str(e)}, 500
+        job_id = ingest_queue.submit(device_id, farmer_id, timestamp, detections, filename, image, population=population)
+        if not job_id:
+            return {"error": "empty image"}, 400
+        return {
+            "status": "queued",
+            "job_id": job_id,
+            "status_url": url_for("upload_status", job_id=job_id),
+            "farmer_id": farmer_id,
+            "device_id": device_id,
+            "detections": detections,
+            "timestamp": timestamp
+        }, 202
     
     # Store detections as JSON
-    append_record(timestamp, farmer_id, detections, image_url, device_id=device_id)
+    if not append_record(timestamp, farmer_id, detections, "", device_id=device_id, population=population):
+        return {"error": "record insert failed"}, 500
     
     return {
         "status": "ok",
         "farmer_id": farmer_id,
         "device_id": device_id,
-        "image_url": image_url,
+        "image_url": "",
         "detections": detections,
         "timestamp": timestamp
     }, 200
 
+MAX_BATCH_RECORDS = int(os.getenv("MAX_BATCH_RECORDS", 200))
+batch_upload_pool = ThreadPoolExecutor(max_workers=int(os.getenv("BATCH_UPLOAD_WORKERS", 8)),
+                                       thread_name_prefix="batch-upload")
+
+@app.route('/api/upload_batch', methods=['POST'])
+@idempotent
+def upload_batch():
+    """
+    Device catch-up endpoint: many detection records (each with an optional image) in one request.
+    Accepted bodies:
+      - application/json:    {"records": [{"detections": {...}, "timestamp": "...", "image_base64": "..."}, ...]}
+      - multipart/form-data: "records" JSON field whose items name their file part in "image"
+    Images are uploaded concurrently, then all rows are inserted with a single insert([...]).
+    Items whose image fails to upload are not inserted, so the device can retry just those; the
+    response is then 207 instead of 200, which is not stored for Idempotency-Key replays.
+    """
+    device_key = request.headers.get("Device-Key")
+    if not device_key:
+        return {"error": "Device-Key header missing"}, 400
+    
+    device = users_db.get_device_by_key(device_key)
+    if not device:
+        return {"error": "invalid device_key"}, 403
+    
+    device_id = device[0]
+    farmer_id = device[3]
+    
+    if request.mimetype == "multipart/form-data":
+        try:
+            items = json.loads(request.form.get("records", ""))
+        except ValueError:
+            items = None
+    else:
+        data = request.get_json(silent=True) or {}
+        items = data.get("records")
+    if not isinstance(items, list) or not items:
+        return {"error": "records must be a non-empty JSON array"}, 400
+    if len(items) > MAX_BATCH_RECORDS:
+        return {"error": f"at most {MAX_BATCH_RECORDS} records per batch"}, 413
+    
+    now = datetime.utcnow().isoformat()
+    results = []
+    pending = []  # (index, record, image bytes or None)
+    for i, item in enumerate(items):
+        detections = item.get("detections", {}) if isinstance(item, dict) else None
+        if not isinstance(detections, dict):
+            results.append({"index": i, "status": "error", "error": "detections must be a JSON object"})
+            continue
+        try:
+            population = parse_population(item.get("population"))
+        except ValueError:
+            results.append({"index": i, "status": "error", "error": "population must be a JSON object"})
+            continue
+        
+        # Devices catching up after an outage send their original capture time; stored as naive UTC like
+        # every other record, so keyset cursors and the rollup compare like with like
+        ts = parse_timestamp(item.get("timestamp")) if item.get("timestamp") else None
+        timestamp = ts.replace(tzinfo=None).isoformat() if ts else now
+        
+        image = None
+        try:
+            if item.get("image_base64"):
+                image = base64.b64decode(item["image_base64"], validate=True)
+            elif item.get("image"):
+                part = request.files.get(item["image"])
+                if part is None:
+                    raise ValueError(f"missing file part {item['image']!r}")
+                image = part.read()
+        except Exception as e:
+            results.append({"index": i, "status": "error", "error": f"invalid image: {e}"})
+            continue
+        
+        record = make_record(timestamp, farmer_id, detections, "", device_id=device_id, population=population)
+        results.append({"index": i, "status": "ok", "timestamp": timestamp})
+        pending.append((i, record, image))
+    
+    # Upload the images concurrently (identical images once); each failed upload drops only its own record
+    digests = {i: image_digest(image) for i, record, image in pending if image}
+    uploads = {}
+    for i, record, image in pending:
+        if image and digests[i] not in uploads:
+            filename = f"{record['timestamp'][:19].replace(':', '-')}_{farmer_id}_{uuid.uuid4().hex[:8]}.jpg"
+            uploads[digests[i]] = batch_upload_pool.submit(store_image, filename, image, digests[i])
+    rows = []
+    for i, record, image in pending:
+        if i in digests:
+            urls = uploads[digests[i]].result()
+            if not urls:
+                results[i] = {"index": i, "status": "error", "error": "image upload failed", "retryable": True}
+                continue
+            record.update(urls)
+            results[i]["image_url"] = urls["image_url"]
+        rows.append(record)
+    
+    if rows and not append_records(rows):
+        for r in results:
+            if r["status"] == "ok":
+                r.update(status="error", error="record insert failed")
+        return jsonify({"status": "error", "inserted": 0, "results": results}), 502
+    
+    # A storage hiccup must not be replayed to the device's retry of the same batch for the key's lifetime
+    retryable = any(r.get("retryable") for r in results)
+    return jsonify({
+        "status": "partial" if retryable else "ok",
+        "farmer_id": farmer_id,
+        "device_id": device_id,
+        "inserted": len(rows),
+        "failed": len(results) - len(rows),
+        "results": results
+    }), 207 if retryable else 200
+
+@app.route('/api/upload_status/<job_id>')
+def upload_status(job_id):
+    """Status of a background image upload for the posting device: queued / uploading / done / failed /
+    insert_failed (the record insert kept failing; retried by the queue)"""
+    device_key = request.headers.get("Device-Key")
+    if not device_key:
+        return {"error": "Device-Key header missing"}, 400
+    
+    device = users_db.get_device_by_key(device_key)
+    if not device:
+        return {"error": "invalid device_key"}, 403
+    
+    job = ingest_queue.status(job_id)
+    if not job or job["device_id"] != str(device[0]):
+        return {"error": "unknown job_id"}, 404
+    return jsonify(job)
+
 @app.route("/debug/records/<farmer_id>")
 def debug_records(farmer_id):
     """Debug endpoint to check what's in the database"""
@@ -931,16 +1152,10 @@ def debug_records(farmer_id):
     # Show first 5 records with parsed detections
     debug_info = []
     for r in records[:5]:
-        detections = r.get("detections", {})
-        if isinstance(detections, str):
-            try:
-                detections = json.loads(detections)
-            except:
-                detections = {}
-        
         debug_info.append({
             "timestamp": r.get("timestamp"),
-            "detections": detections,
+            "detections": parse_detections(r.get("detections")),
+            "population": r.get("population"),
             "farmer_id": r.get("farmer_id"),
             "device_id": r.get("device_id")
         })
@@ -951,10 +1166,39 @@ def debug_records(farmer_id):
     })
 
 
+@app.route("/debug/cache_stats")
+def debug_cache_stats():
+    """Record cache hit/miss counters for this worker (for sizing RECORD_CACHE_SIZE / RECORD_CACHE_TTL)"""
+    user = current_user()
+    if not user or user['role'] != 'admin':
+        return {"error": "unauthorized"}, 401
+    return jsonify({"pid": os.getpid(), **record_cache.stats(), "device_keys": users_db.device_cache.stats()})
+
+
 @app.route("/static/<path:filename>")
 def serve_static(filename):
     return send_from_directory('static', filename)
 
+@app.route("/assets/<path:filename>")
+def asset(filename):
+    source = assets.source(filename)
+    if not source:
+        abort(404)
+    response = send_from_directory(assets.folder, source)
+    # The name changes with the content, so browsers never need to revalidate
+    response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    return response
+
+@app.route("/service-worker.js")
+def service_worker():
+    """static/service-worker.js with the current asset URLs to precache; served from / so it controls every page"""
+    script = (APP_ROOT / "static" / "service-worker.js").read_text()
+    asset_urls = [url_for("asset", filename=name) for name in assets.names.values()]
+    script = script.replace("__ASSET_VERSION__", assets.version).replace("__ASSET_URLS__", json.dumps(asset_urls))
+    response = app.response_class(script, mimetype="application/javascript")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 @app.route("/health")
 def health():
     return {"ok": True}
@@ -0,0 +1,32 @@
+# assets.py - Content-hashed names for the shared static CSS / JS, so they can be cached as immutable
+import hashlib
+from pathlib import Path
+
+
+class AssetManifest:
+    """
+    Maps each asset under `folder` to a fingerprinted name (css/app.css -> css/app.3f9a1c2b.css) computed
+    once at startup. A changed file gets a new name on the next deploy, so the old URL can be cached forever.
+    """
+
+    def __init__(self, folder, names, digest_size=8):
+        self.folder = Path(folder)
+        self.names = {}
+        self.sources = {}
+        version = hashlib.blake2b(digest_size=digest_size)
+        for name in names:
+            digest = hashlib.blake2b((self.folder / name).read_bytes(), digest_size=digest_size).hexdigest()
+            stem, dot, ext = name.rpartition(".")
+            fingerprinted = f"{stem}.{digest}.{ext}" if dot else f"{name}.{digest}"
+            self.names[name] = fingerprinted
+            self.sources[fingerprinted] = name
+            version.update(digest.encode())
+        # Changes whenever any asset does; names the service worker cache
+        self.version = version.hexdigest()
+
+    def fingerprinted(self, name):
+        return self.names[name]
+
+    def source(self, fingerprinted):
+        """Asset path for a fingerprinted name, None for unknown or outdated names"""
+        return self.sources.get(fingerprinted)
@@ -0,0 +1,78 @@
+# backfill_derivatives.py - Create thumb / medium previews for images uploaded before derivatives existed
+#
+# Usage: python backfill_derivatives.py
+# Run after adding the thumb_url / medium_url columns from rollup_schema.sql. Records that already
+# have a thumb_url are skipped, so the script can be interrupted and re-run.
+import os
+
+from supabase import create_client
+
+from derivatives import derivative_filename, make_derivatives
+
+BUCKET = "insect-images"
+BATCH_SIZE = 100
+
+
+def storage_path(image_url):
+    """insects/... path of a public storage URL, None for images hosted elsewhere"""
+    marker = f"/object/public/{BUCKET}/"
+    if marker not in image_url:
+        return None
+    return image_url.split(marker, 1)[1].split("?", 1)[0]
+
+
+def public_url(client, path):
+    url = client.storage.from_(BUCKET).get_public_url(path)
+    if isinstance(url, dict):
+        return url.get("publicURL") or url.get("public_url") or url.get("url")
+    return url
+
+
+def fetch_pending(client):
+    """Records with an image but no thumbnail, paged by id"""
+    last_id = 0
+    while True:
+        res = client.table("insect_records") \
+            .select("id,image_url") \
+            .neq("image_url", "") \
+            .is_("thumb_url", "null") \
+            .gt("id", last_id) \
+            .order("id", desc=False) \
+            .limit(BATCH_SIZE) \
+            .execute()
+        rows = res.data or []
+        yield from rows
+        if len(rows) < BATCH_SIZE:
+            break
+        last_id = rows[-1]["id"]
+
+
+def backfill():
+    client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    storage = client.storage.from_(BUCKET)
+    done = skipped = 0
+    for row in fetch_pending(client):
+        path = storage_path(row["image_url"] or "")
+        if not path:
+            skipped += 1
+            continue
+        try:
+            original = storage.download(path)
+            urls = {}
+            for kind, jpeg in make_derivatives(original).items():
+                derived_path = derivative_filename(path, kind)
+                storage.upload(derived_path, jpeg, {"content-type": "image/jpeg", "upsert": "true"})
+                urls[f"{kind}_url"] = public_url(client, derived_path)
+            if not urls:
+                skipped += 1
+                continue
+            client.table("insect_records").update(urls).eq("id", row["id"]).execute()
+            done += 1
+        except Exception as e:
+            print(f"Record {row['id']}: {e}")
+            skipped += 1
+    print(f"Created previews for {done} records ({skipped} skipped).")
+
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,62 @@
+# backfill_rollup.py - Rebuild insect_daily_rollup from the existing insect_records history
+#
+# Usage: python backfill_rollup.py [--reset | --since YYYY-MM-DD]
+# Run after creating the table/function from rollup_schema.sql. Records ingested while the
+# backfill is running may be counted twice, so run it before pointing devices at the new code
+# (or re-run it with --reset afterwards).
+# --since rebuilds only the days from that date on, e.g. after the app logged a rollup update error.
+import argparse
+import os
+
+from supabase import create_client
+
+from rollup import ROLLUP_TABLE, rollup_rows
+
+BATCH_SIZE = 1000
+
+
+def fetch_all_records(client, since_day=None):
+    """Page through insect_records by id so large histories don't hit the API row cap"""
+    last_id = 0
+    while True:
+        query = client.table("insect_records").select("id,timestamp,farmer_id,device_id,detections")
+        if since_day:
+            query = query.gte("timestamp", since_day)
+        res = query \
+            .gt("id", last_id) \
+            .order("id", desc=False) \
+            .limit(BATCH_SIZE) \
+            .execute()
+        rows = res.data or []
+        yield from rows
+        if len(rows) < BATCH_SIZE:
+            break
+        last_id = rows[-1]["id"]
+
+
+def backfill(reset=False, since_day=None):
+    client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+
+    if reset or since_day:
+        # PostgREST refuses unfiltered deletes, so match every row explicitly
+        client.table(ROLLUP_TABLE).delete().gte("day", since_day or "1900-01-01").execute()
+        print(f"Cleared existing rollup rows{f' from {since_day}' if since_day else ''}")
+
+    rows = rollup_rows(fetch_all_records(client, since_day))
+    if since_day:
+        # Only replace the days that were cleared above
+        rows = [r for r in rows if r["day"] >= since_day]
+    for i in range(0, len(rows), BATCH_SIZE):
+        client.table(ROLLUP_TABLE) \
+            .upsert(rows[i:i + BATCH_SIZE], on_conflict="farmer_id,device_id,day,insect") \
+            .execute()
+    print(f"Backfilled {len(rows)} rollup rows.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild insect_daily_rollup from insect_records")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--reset", action="store_true", help="clear and rebuild the whole rollup")
+    group.add_argument("--since", metavar="YYYY-MM-DD", help="clear and rebuild the days from this date on")
+    args = parser.parse_args()
+    backfill(reset=args.reset, since_day=args.since)
@@ -0,0 +1,68 @@
+# bench_templates.py - Render time per page: render_template_string (compile every call) vs precompiled templates
+#
+# Usage: python bench_templates.py [--renders 200]
+# Renders every page in html_templates.TEMPLATES with a small sample context; no database or Supabase needed.
+import argparse
+import time
+
+from flask import Flask, render_template, render_template_string
+from jinja2 import DictLoader
+
+from html_templates import TEMPLATES
+
+SAMPLE_RECORDS = [
+    {"id": i, "timestamp": f"2025-10-{i % 28 + 1:02d}T08:00:00", "farmer_id": "farmer_001", "device_id": 1,
+     "detections": {"aphid": i % 5, "whitefly": i % 3}, "image_url": "", "thumb_url": "", "medium_url": ""}
+    for i in range(50)
+]
+SAMPLE_CONTEXT = {
+    "username": "admin",
+    "farmer_id": "farmer_001",
+    "records": SAMPLE_RECORDS,
+    "devices": [(1, "Field-Device-1", "0" * 64, "farmer_001", "2025-10-01 08:00:00")],
+    "farmers": [(2, "farmer1", "farmer_001")],
+    "device": (1, "Field-Device-1", "0" * 64, "farmer_001"),
+    "insect_summary": [{"insect": "aphid", "count": 100}, {"insect": "whitefly", "count": 49}],
+    "summary": {"aphid": 100, "whitefly": 49},
+    "total_detections": 50,
+    "total_devices": 1,
+    "total_farmers": 1,
+    "total_insects": 149,
+    "total_count": 149,
+    "top_insect": "aphid",
+    "top_count": 100,
+    "available_images": [],
+    "total_images": 0,
+    "image_range": (1, 0),
+}
+
+
+def per_render_ms(render, renders):
+    start = time.perf_counter()
+    for _ in range(renders):
+        render()
+    return (time.perf_counter() - start) * 1000 / renders
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark page template rendering")
+    parser.add_argument("--renders", type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.secret_key = "bench"
+    app.jinja_loader = DictLoader(TEMPLATES)
+    app.jinja_env.globals["asset_url"] = lambda name: f"/assets/{name}"
+    for name in TEMPLATES:
+        app.jinja_env.get_template(name)
+
+    print(f"{'page':<30}{'string ms':>12}{'compiled ms':>14}{'speedup':>10}")
+    with app.test_request_context("/"):
+        for name, source in TEMPLATES.items():
+            before = per_render_ms(lambda: render_template_string(source, **SAMPLE_CONTEXT), args.renders)
+            after = per_render_ms(lambda: render_template(name, **SAMPLE_CONTEXT), args.renders)
+            print(f"{name:<30}{before:>12.3f}{after:>14.3f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
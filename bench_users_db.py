@@ -0,0 +1,66 @@
+# bench_users_db.py - Device-key lookups per second: connect-per-query helpers vs the pooled UsersDAO
+#
+# Usage: python bench_users_db.py [--devices 200] [--lookups 20000] [--threads 4]
+# Runs against a throwaway copy of the schema in a temp directory; users.db is never touched.
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from users_dao import UsersDAO
+
+
+def connect_per_query(db_path):
+    """The old app.py helper: open, query, close"""
+    def get_device_by_key(device_key):
+        conn = sqlite3.connect(db_path)
+        cur = conn.cursor()
+        cur.execute("SELECT id, device_name, device_key, farmer_id FROM devices WHERE device_key=?", (device_key,))
+        row = cur.fetchone()
+        conn.close()
+        return row
+    return get_device_by_key
+
+
+def run(lookup, keys, lookups, threads):
+    """Lookups per second with `threads` threads sharing the work"""
+    per_thread = lookups // threads
+
+    def worker():
+        for i in range(per_thread):
+            assert lookup(keys[i % len(keys)]) is not None
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark users.db device-key lookups")
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "users.db")
+        dao = UsersDAO(db_path)
+        keys = [dao.create_device(f"trap-{i}", f"farmer_{i % 20:03d}")["device_key"] for i in range(args.devices)]
+        random.shuffle(keys)
+
+        for threads in sorted({1, args.threads}):
+            before = run(connect_per_query(db_path), keys, args.lookups, threads)
+            after = run(dao.get_device_by_key, keys, args.lookups, threads)
+            print(f"{threads} thread(s): connect per query {before:,.0f} lookups/s, "
+                  f"pooled DAO {after:,.0f} lookups/s ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# dedupe.py - Content-addressed image index and Idempotency-Key store for device uploads
+import hashlib
+import sqlite3
+from datetime import datetime, timedelta
+
+
+def image_digest(data=None):
+    """BLAKE2b digest object (call .update() per chunk) or, given bytes, the hex digest of the image"""
+    digest = hashlib.blake2b(digest_size=32)
+    if data is None:
+        return digest
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class ImageIndex:
+    """
+    Maps image content digests to the storage path / public URLs (original and derivatives) they were
+    uploaded under, so a re-sent image (device retry, timeout) is linked instead of uploaded again.
+    Queries run on the UsersDAO's per-thread connection to users.db.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        conn = self.db.connection()
+        with conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_hashes (
+                digest TEXT PRIMARY KEY,
+                storage_path TEXT,
+                image_url TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            """)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(image_hashes)")]
+            for column in ("thumb_url", "medium_url"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE image_hashes ADD COLUMN {column} TEXT")
+
+    def lookup(self, digest):
+        """{"image_url", "thumb_url", "medium_url"} of an already stored image with this digest, or None"""
+        row = self.db.connection().execute("SELECT image_url, thumb_url, medium_url FROM image_hashes "
+                                           "WHERE digest=?", (digest,)).fetchall()
+        if not row:
+            return None
+        return {key: url for key, url in zip(("image_url", "thumb_url", "medium_url"), row[0]) if url}
+
+    def remember(self, digest, storage_path, urls):
+        conn = self.db.connection()
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO image_hashes (digest, storage_path, image_url, thumb_url, "
+                         "medium_url) VALUES (?,?,?,?,?)",
+                         (digest, storage_path, urls["image_url"], urls.get("thumb_url"), urls.get("medium_url")))
+
+
+class IdempotencyStore:
+    """
+    Remembers the response to each (device, Idempotency-Key) so a retried upload gets the original
+    answer instead of creating a second record. A key is reserved while its request runs; keys expire
+    after `ttl`, and a reservation older than `pending_timeout` is treated as abandoned.
+    """
+
+    def __init__(self, db, ttl=timedelta(hours=24), pending_timeout=timedelta(minutes=10)):
+        self.db = db
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout
+        conn = self.db.connection()
+        with conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                scope TEXT,
+                key TEXT,
+                status_code INTEGER,
+                body TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (scope, key)
+            );
+            """)
+
+    @staticmethod
+    def _stamp(delta):
+        return (datetime.utcnow() - delta).strftime("%Y-%m-%d %H:%M:%S")
+
+    def begin(self, scope, key):
+        """
+        Reserve the key. Returns None when the caller should process the request, otherwise the stored
+        (status_code, body); status_code is None while the first request is still running.
+        """
+        conn = self.db.connection()
+        with conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (self._stamp(self.ttl),))
+            try:
+                conn.execute("INSERT INTO idempotency_keys (scope, key) VALUES (?,?)", (scope, key))
+                return None
+            except sqlite3.IntegrityError:
+                pass
+            cur = conn.execute("UPDATE idempotency_keys SET created_at=CURRENT_TIMESTAMP "
+                               "WHERE scope=? AND key=? AND status_code IS NULL AND created_at < ?",
+                               (scope, key, self._stamp(self.pending_timeout)))
+            if cur.rowcount == 1:
+                return None
+            rows = conn.execute("SELECT status_code, body FROM idempotency_keys WHERE scope=? AND key=?",
+                                (scope, key)).fetchall()
+            return rows[0] if rows else None
+
+    def complete(self, scope, key, status_code, body):
+        conn = self.db.connection()
+        with conn:
+            conn.execute("UPDATE idempotency_keys SET status_code=?, body=? WHERE scope=? AND key=?",
+                         (status_code, body, scope, key))
+
+    def release(self, scope, key):
+        """Forget a reservation whose request failed, so the client may retry with the same key"""
+        conn = self.db.connection()
+        with conn:
+            conn.execute("DELETE FROM idempotency_keys WHERE scope=? AND key=? AND status_code IS NULL",
+                         (scope, key))
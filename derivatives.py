@@ -0,0 +1,39 @@
+# derivatives.py - Thumbnail / medium JPEG previews of uploaded trap images (Pillow)
+import io
+import os
+
+from PIL import Image, ImageOps
+
+# Longest side in pixels for each derivative, largest first (each is scaled from the previous one)
+DERIVATIVE_SIZES = {"medium": 1024, "thumb": 320}
+JPEG_QUALITY = {"medium": 82, "thumb": 75}
+
+
+def derivative_filename(filename, kind):
+    """Storage name of a derivative, next to the original: abc.jpg -> abc_thumb.jpg"""
+    stem, _ = os.path.splitext(filename)
+    return f"{stem}_{kind}.jpg"
+
+
+def make_derivatives(data):
+    """
+    JPEG bytes for every size in DERIVATIVE_SIZES; data is the original image as bytes or a file path.
+    Returns {} when the image can't be decoded.
+    """
+    try:
+        image = Image.open(io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data)
+        # Let the JPEG decoder downscale by 1/2..1/8 while decoding, well before the largest size is reached
+        largest = max(DERIVATIVE_SIZES.values())
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    except Exception as e:
+        print(f"Derivative decode error: {e}")
+        return {}
+
+    out = {}
+    for kind, size in DERIVATIVE_SIZES.items():
+        image.thumbnail((size, size), Image.LANCZOS, reducing_gap=3.0)
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=JPEG_QUALITY.get(kind, 80), optimize=True, progressive=True)
+        out[kind] = buffer.getvalue()
+    return out
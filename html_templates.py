@@ -1,1022 +1,10 @@
 # html_templates.py - All HTML Templates for JP Global InsectDetect
 
-# Shared CSS and Sidebar Styles
-SIDEBAR_STYLES = """
-<style>
-    * {
-        margin: 0;
-        padding: 0;
-        box-sizing: border-box;
-    }
-    
-    body {
-        font-family: 'Poppins', sans-serif;
-        background: linear-gradient(135deg, #0a0e27 0%, #1a1f3a 50%, #0f1419 100%);
-        min-height: 100vh;
-        color: #ffffff;
-        display: flex;
-        overflow-x: hidden;
-    }
-    
-    /* Mobile Menu Button (Hamburger) */
-    .mobile-menu-btn {
-        position: fixed;
-        top: 20px;
-        left: 20px;
-        z-index: 2001;
-        font-size: 28px;
-        color: #ffffff;
-        cursor: pointer;
-        background: rgba(255, 127, 80, 0.15);
-        width: 48px;
-        height: 48px;
-        border-radius: 12px;
-        border: 1px solid rgba(255, 127, 80, 0.3);
-        backdrop-filter: blur(10px);
-        align-items: center;
-        justify-content: center;
-        transition: all 0.3s ease;
-        display: none; /* Hidden by default, shown in mobile via media query */
-    }
-    
-    .mobile-menu-btn:hover {
-        background: rgba(255, 127, 80, 0.25);
-        transform: scale(1.05);
-    }
-    
-    .mobile-menu-btn:active {
-        transform: scale(0.95);
-    }
-    
-    /* Overlay for mobile sidebar */
-    .sidebar-overlay {
-        display: none;
-        position: fixed;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background: rgba(0, 0, 0, 0.7);
-        backdrop-filter: blur(4px);
-        z-index: 999;
-        opacity: 0;
-        transition: opacity 0.3s ease;
-    }
-    
-    .sidebar-overlay.active {
-        opacity: 1;
-    }
-    
-    /* Sidebar Styles */
-    .sidebar {
-        width: 260px;
-        background: rgba(255, 255, 255, 0.03);
-        backdrop-filter: blur(20px);
-        border-right: 1px solid rgba(255, 255, 255, 0.08);
-        padding: 24px 0;
-        position: fixed;
-        height: 100vh;
-        left: 0;
-        top: 0;
-        overflow-y: auto;
-        overflow-x: hidden;
-        z-index: 1000;
-        transition: transform 0.3s ease-in-out;
-    }
-    
-    /* Sidebar scrollbar styling */
-    .sidebar::-webkit-scrollbar {
-        width: 6px;
-    }
-    
-    .sidebar::-webkit-scrollbar-track {
-        background: rgba(255, 255, 255, 0.02);
-    }
-    
-    .sidebar::-webkit-scrollbar-thumb {
-        background: rgba(255, 127, 80, 0.3);
-        border-radius: 3px;
-    }
-    
-    .sidebar::-webkit-scrollbar-thumb:hover {
-        background: rgba(255, 127, 80, 0.5);
-    }
-    
-    .sidebar-logo {
-        padding: 0 20px 24px 20px;
-        border-bottom: 1px solid rgba(255, 255, 255, 0.08);
-        text-align: center;
-    }
-    
-    .sidebar-logo img {
-        width: 160px;
-        height: auto;
-        margin-bottom: 8px;
-    }
-    
-    .sidebar-title {
-        font-size: 14px;
-        font-weight: 500;
-        color: rgba(255, 255, 255, 0.5);
-    }
-    
-    .sidebar-menu {
-        padding: 20px 0;
-    }
-    
-    .menu-item {
-        display: flex;
-        align-items: center;
-        padding: 14px 24px;
-        color: rgba(255, 255, 255, 0.7);
-        text-decoration: none;
-        transition: all 0.3s ease;
-        font-size: 14px;
-        font-weight: 500;
-        border-left: 3px solid transparent;
-    }
-    
-    .menu-item i {
-        margin-right: 12px;
-        font-size: 16px;
-        width: 20px;
-        text-align: center;
-    }
-    
-    .menu-item:hover {
-        background: rgba(255, 255, 255, 0.05);
-        color: #ff7f50;
-        border-left-color: #ff7f50;
-    }
-    
-    .menu-item.active {
-        background: rgba(255, 127, 80, 0.1);
-        color: #ff7f50;
-        border-left-color: #ff7f50;
-    }
-    
-    .menu-item.logout {
-        color: #ff6b6b;
-        margin-top: 20px;
-        border-top: 1px solid rgba(255, 255, 255, 0.08);
-        padding-top: 24px;
-    }
-    
-    .menu-item.logout:hover {
-        background: rgba(255, 107, 107, 0.1);
-        color: #ff6b6b;
-        border-left-color: #ff6b6b;
-    }
-    
-    /* Main Content Area */
-    .main-content {
-        margin-left: 260px;
-        flex: 1;
-        padding: 32px;
-        width: calc(100% - 260px);
-        min-height: 100vh;
-        transition: margin-left 0.3s ease-in-out, width 0.3s ease-in-out;
-    }
-    
-    .page-header {
-        margin-bottom: 32px;
-        padding-bottom: 20px;
-        border-bottom: 1px solid rgba(255, 255, 255, 0.08);
-    }
-    
-    .page-title {
-        font-size: 32px;
-        font-weight: 700;
-        background: linear-gradient(135deg, #ff7f50 0%, #409cff 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        margin-bottom: 8px;
-    }
-    
-    .page-subtitle {
-        font-size: 14px;
-        color: rgba(255, 255, 255, 0.5);
-    }
-    
-    /* Stats Grid */
-    .stats-grid {
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-        gap: 20px;
-        margin-bottom: 32px;
-    }
-    
-    .stat-card {
-        background: rgba(255, 255, 255, 0.03);
-        backdrop-filter: blur(20px);
-        border: 1px solid rgba(255, 255, 255, 0.08);
-        border-radius: 16px;
-        padding: 24px;
-        transition: all 0.3s ease;
-    }
-    
-    .stat-card:hover {
-        transform: translateY(-4px);
-        border-color: rgba(255, 127, 80, 0.3);
-        box-shadow: 0 8px 24px rgba(255, 127, 80, 0.15);
-    }
-    
-    .stat-icon {
-        width: 56px;
-        height: 56px;
-        border-radius: 12px;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        font-size: 24px;
-        margin-bottom: 16px;
-    }
-    
-    .stat-icon.orange {
-        background: linear-gradient(135deg, rgba(255, 127, 80, 0.2) 0%, rgba(255, 127, 80, 0.05) 100%);
-        color: #ff7f50;
-    }
-    
-    .stat-icon.blue {
-        background: linear-gradient(135deg, rgba(64, 156, 255, 0.2) 0%, rgba(64, 156, 255, 0.05) 100%);
-        color: #409cff;
-    }
-    
-    .stat-icon.green {
-        background: linear-gradient(135deg, rgba(76, 217, 100, 0.2) 0%, rgba(76, 217, 100, 0.05) 100%);
-        color: #4cd964;
-    }
-    
-    .stat-icon.purple {
-        background: linear-gradient(135deg, rgba(175, 82, 222, 0.2) 0%, rgba(175, 82, 222, 0.05) 100%);
-        color: #af52de;
-    }
-    
-    .stat-label {
-        font-size: 13px;
-        color: rgba(255, 255, 255, 0.6);
-        margin-bottom: 4px;
-    }
-    
-    .stat-value {
-        font-size: 32px;
-        font-weight: 700;
-        color: #ffffff;
-    }
-    
-    /* Chart Container */
-    .chart-container {
-        background: rgba(255, 255, 255, 0.03);
-        backdrop-filter: blur(20px);
-        border: 1px solid rgba(255, 255, 255, 0.08);
-        border-radius: 16px;
-        padding: 28px;
-        margin-bottom: 24px;
-    }
-    
-    .chart-header {
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-        margin-bottom: 24px;
-        flex-wrap: wrap;
-        gap: 16px;
-    }
-    
-    .chart-title {
-        font-size: 18px;
-        font-weight: 600;
-        color: #ffffff;
-    }
-    
-    /* Table Styles */
-    .table-container {
-        background: rgba(255, 255, 255, 0.03);
-        backdrop-filter: blur(20px);
-        border: 1px solid rgba(255, 255, 255, 0.08);
-        border-radius: 16px;
-        padding: 28px;
-        overflow-x: auto;
-    }
-    
-    table {
-        width: 100%;
-        border-collapse: collapse;
-        min-width: 600px;
-    }
-    
-    thead tr {
-        border-bottom: 1px solid rgba(255, 255, 255, 0.1);
-    }
-    
-    th {
-        padding: 12px 16px;
-        text-align: left;
-        font-size: 13px;
-        font-weight: 600;
-        color: rgba(255, 255, 255, 0.7);
-        text-transform: uppercase;
-    }
-    
-    td {
-        padding: 16px;
-        border-bottom: 1px solid rgba(255, 255, 255, 0.05);
-        color: rgba(255, 255, 255, 0.9);
-        font-size: 14px;
-    }
-    
-    tbody tr {
-        transition: all 0.2s ease;
-    }
-    
-    tbody tr:hover {
-        background: rgba(255, 255, 255, 0.03);
-    }
-    
-    /* Image Styles */
-    .image-thumb {
-        width: 120px;
-        height: 80px;
-        object-fit: cover;
-        border-radius: 8px;
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        cursor: pointer;
-        transition: all 0.3s ease;
-    }
-    
-    .image-thumb:hover {
-        transform: scale(1.05);
-        border-color: #ff7f50;
-    }
-    
-    .image-gallery {
-        display: grid;
-        grid-template-columns: repeat(auto-fill, minmax(250px, 1fr));
-        gap: 20px;
-    }
-    
-    .image-card {
-        background: rgba(255, 255, 255, 0.03);
-        border: 1px solid rgba(255, 255, 255, 0.08);
-        border-radius: 12px;
-        overflow: hidden;
-        transition: all 0.3s ease;
-        cursor: pointer;
-    }
-    
-    .image-card:hover {
-        transform: translateY(-4px);
-        border-color: rgba(255, 127, 80, 0.3);
-    }
-    
-    .image-card img {
-        width: 100%;
-        height: 200px;
-        object-fit: cover;
-    }
-    
-    .image-card-info {
-        padding: 12px;
-    }
-    
-    .image-card-title {
-        font-size: 14px;
-        font-weight: 600;
-        color: #ffffff;
-        margin-bottom: 4px;
-    }
-    
-    .image-card-meta {
-        font-size: 12px;
-        color: rgba(255, 255, 255, 0.5);
-    }
-    
-    /* Form Styles */
-    .form-container {
-        background: rgba(255, 255, 255, 0.03);
-        backdrop-filter: blur(20px);
-        border: 1px solid rgba(255, 255, 255, 0.08);
-        border-radius: 16px;
-        padding: 28px;
-        margin-bottom: 24px;
-    }
-    
-    .form-grid {
-        display: grid;
-        grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-        gap: 20px;
-        margin-bottom: 20px;
-    }
-    
-    .form-group {
-        margin-bottom: 20px;
-    }
-    
-    .form-group label {
-        display: block;
-        color: rgba(255, 255, 255, 0.8);
-        font-size: 14px;
-        font-weight: 500;
-        margin-bottom: 8px;
-    }
-    
-    .form-group input,
-    .form-group select {
-        width: 100%;
-        padding: 12px 16px;
-        background: rgba(255, 255, 255, 0.05);
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        border-radius: 10px;
-        color: #ffffff;
-        font-size: 14px;
-        font-family: 'Poppins', sans-serif;
-    }
-    
-    .form-group input:focus,
-    .form-group select:focus {
-        outline: none;
-        background: rgba(255, 255, 255, 0.08);
-        border-color: #ff7f50;
-        box-shadow: 0 0 0 3px rgba(255, 127, 80, 0.1);
-    }
-    
-    /* Buttons */
-    .btn {
-        padding: 12px 28px;
-        border: none;
-        border-radius: 10px;
-        font-size: 14px;
-        font-weight: 600;
-        cursor: pointer;
-        transition: all 0.3s ease;
-        font-family: 'Poppins', sans-serif;
-        text-decoration: none;
-        display: inline-block;
-    }
-    
-    .btn-primary {
-        background: linear-gradient(135deg, #ff7f50 0%, #ff6b45 100%);
-        color: #ffffff;
-    }
-    
-    .btn-primary:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 20px rgba(255, 127, 80, 0.3);
-    }
-    
-    .btn-secondary {
-        background: rgba(64, 156, 255, 0.15);
-        color: #409cff;
-        border: 1px solid rgba(64, 156, 255, 0.3);
-    }
-    
-    .btn-secondary:hover {
-        background: rgba(64, 156, 255, 0.25);
-    }
-    
-    /* Filter Bar */
-    .filter-bar {
-        background: rgba(255, 255, 255, 0.03);
-        backdrop-filter: blur(20px);
-        border: 1px solid rgba(255, 255, 255, 0.08);
-        border-radius: 12px;
-        padding: 20px;
-        margin-bottom: 24px;
-        display: flex;
-        align-items: center;
-        gap: 16px;
-        flex-wrap: wrap;
-    }
-    
-    .filter-bar select {
-        flex: 1;
-        min-width: 200px;
-        padding: 10px 16px;
-        background: rgba(255, 255, 255, 0.05);
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        border-radius: 8px;
-        color: #ffffff;
-        font-size: 14px;
-    }
-    
-    /* Modal */
-    .modal {
-        display: none;
-        position: fixed;
-        z-index: 2000;
-        left: 0;
-        top: 0;
-        width: 100%;
-        height: 100%;
-        background: rgba(0, 0, 0, 0.9);
-        backdrop-filter: blur(10px);
-    }
-    
-    .modal-content {
-        position: relative;
-        margin: 5% auto;
-        max-width: 800px;
-        animation: zoomIn 0.3s ease;
-        padding: 0 20px;
-    }
-    
-    .modal-content img {
-        width: 100%;
-        border-radius: 12px;
-    }
-    
-    .close-modal {
-        position: absolute;
-        top: -40px;
-        right: 0;
-        color: #fff;
-        font-size: 32px;
-        font-weight: bold;
-        cursor: pointer;
-        transition: all 0.3s ease;
-    }
-    
-    .close-modal:hover {
-        color: #ff7f50;
-    }
-    
-    @keyframes zoomIn {
-        from {
-            transform: scale(0.8);
-            opacity: 0;
-        }
-        to {
-            transform: scale(1);
-            opacity: 1;
-        }
-    }
-    
-    /* Flash Messages */
-    .flash-messages {
-        margin-bottom: 24px;
-    }
-    
-    .flash-message {
-        padding: 14px 20px;
-        border-radius: 10px;
-        margin-bottom: 12px;
-        font-size: 14px;
-        display: flex;
-        align-items: center;
-        gap: 12px;
-    }
-    
-    .flash-message.success {
-        background: rgba(76, 217, 100, 0.15);
-        border: 1px solid rgba(76, 217, 100, 0.3);
-        color: #4cd964;
-    }
-    
-    .flash-message.danger {
-        background: rgba(255, 107, 107, 0.15);
-        border: 1px solid rgba(255, 107, 107, 0.3);
-        color: #ff6b6b;
-    }
-    
-    .flash-message.info {
-        background: rgba(64, 156, 255, 0.15);
-        border: 1px solid rgba(64, 156, 255, 0.3);
-        color: #409cff;
-    }
-    
-    /* Empty State */
-    .empty-state {
-        text-align: center;
-        padding: 60px 20px;
-        color: rgba(255, 255, 255, 0.5);
-    }
-    
-    .empty-state i {
-        font-size: 64px;
-        margin-bottom: 16px;
-        opacity: 0.3;
-    }
-    
-    /* Badge */
-    .badge {
-        display: inline-block;
-        padding: 4px 12px;
-        border-radius: 6px;
-        font-size: 12px;
-        font-weight: 600;
-    }
-    
-    .badge-orange {
-        background: rgba(255, 127, 80, 0.2);
-        color: #ff7f50;
-    }
-    
-    .badge-blue {
-        background: rgba(64, 156, 255, 0.2);
-        color: #409cff;
-    }
-    
-    /* Date Range Buttons */
-    .date-range-buttons {
-        display: flex;
-        gap: 12px;
-        flex-wrap: wrap;
-    }
-    
-    .date-btn {
-        padding: 8px 20px;
-        background: rgba(255, 255, 255, 0.05);
-        border: 1px solid rgba(255, 255, 255, 0.1);
-        border-radius: 8px;
-        color: rgba(255, 255, 255, 0.7);
-        cursor: pointer;
-        transition: all 0.3s ease;
-        font-size: 13px;
-        font-weight: 500;
-    }
-    
-    .date-btn:hover {
-        background: rgba(255, 255, 255, 0.08);
-        color: #ffffff;
-    }
-    
-    .date-btn.active {
-        background: linear-gradient(135deg, #ff7f50 0%, #ff6b45 100%);
-        color: #ffffff;
-        border-color: transparent;
-    }
-    
-    /* ============================================
-       RESPONSIVE DESIGN - MOBILE & TABLET
-       ============================================ */
-    
-    /* Tablet View (768px - 1024px) */
-    @media (max-width: 1024px) {
-        .stats-grid {
-            grid-template-columns: repeat(2, 1fr);
-        }
-        
-        .form-grid {
-            grid-template-columns: 1fr;
-        }
-        
-        .image-gallery {
-            grid-template-columns: repeat(2, 1fr);
-        }
-    }
-    
-    /* Mobile View (up to 768px) - CRITICAL SECTION */
-    @media (max-width: 768px) {
-        body {
-            overflow-x: hidden;
-        }
-        
-        /* Show hamburger button */
-        .mobile-menu-btn {
-            display: flex !important;
-        }
-        
-        /* Hide sidebar by default (slide off-screen) */
-        .sidebar {
-            transform: translateX(-100%);
-        }
-        
-        /* Show sidebar when open */
-        .sidebar.open {
-            transform: translateX(0);
-            box-shadow: 4px 0 24px rgba(0, 0, 0, 0.5);
-        }
-        
-        /* Show overlay when sidebar is open */
-        .sidebar-overlay.active {
-            display: block;
-        }
-        
-        /* Main content takes full width */
-        .main-content {
-            margin-left: 0 !important;
-            width: 100% !important;
-            padding: 80px 16px 20px 16px;
-        }
-        
-        /* Adjust page header */
-        .page-header {
-            margin-bottom: 24px;
-            padding-bottom: 16px;
-        }
-        
-        .page-title {
-            font-size: 24px;
-        }
-        
-        .page-subtitle {
-            font-size: 13px;
-        }
-        
-        /* Stats grid becomes single column */
-        .stats-grid {
-            grid-template-columns: 1fr;
-            gap: 16px;
-        }
-        
-        .stat-card {
-            padding: 20px;
-        }
-        
-        .stat-value {
-            font-size: 28px;
-        }
-        
-        /* Chart containers */
-        .chart-container {
-            padding: 20px;
-        }
-        
-        .chart-header {
-            flex-direction: column;
-            align-items: flex-start;
-        }
-        
-        .chart-title {
-            font-size: 16px;
-        }
-        
-        /* Date range buttons stack */
-        .date-range-buttons {
-            width: 100%;
-        }
-        
-        .date-btn {
-            flex: 1;
-            min-width: 80px;
-            padding: 8px 12px;
-            font-size: 12px;
-        }
-        
-        /* Table container */
-        .table-container {
-            padding: 16px;
-        }
-        
-        table {
-            font-size: 13px;
-        }
-        
-        th, td {
-            padding: 10px 8px;
-        }
-        
-        /* Image gallery becomes single column */
-        .image-gallery {
-            grid-template-columns: 1fr;
-        }
-        
-        .image-card img {
-            height: 180px;
-        }
-        
-        /* Form adjustments */
-        .form-container {
-            padding: 20px;
-        }
-        
-        .form-grid {
-            grid-template-columns: 1fr;
-            gap: 16px;
-        }
-        
-        /* Filter bar */
-        .filter-bar {
-            flex-direction: column;
-            align-items: stretch;
-        }
-        
-        .filter-bar select {
-            width: 100%;
-            min-width: unset;
-        }
-        
-        /* Buttons */
-        .btn {
-            width: 100%;
-            text-align: center;
-            padding: 14px 20px;
-        }
-        
-        /* Modal adjustments */
-        .modal-content {
-            margin: 10% 20px;
-            max-width: calc(100% - 40px);
-        }
-        
-        .close-modal {
-            top: -35px;
-            font-size: 28px;
-        }
-        
-        /* Image thumbs in table */
-        .image-thumb {
-            width: 80px;
-            height: 60px;
-        }
-    }
-    
-    /* Extra small devices */
-    @media (max-width: 480px) {
-        .mobile-menu-btn {
-            top: 15px;
-            left: 15px;
-            width: 44px;
-            height: 44px;
-            font-size: 24px;
-        }
-        
-        .main-content {
-            padding: 70px 12px 16px 12px;
-        }
-        
-        .page-title {
-            font-size: 20px;
-        }
-        
-        .stat-icon {
-            width: 48px;
-            height: 48px;
-            font-size: 20px;
-        }
-        
-        .stat-value {
-            font-size: 24px;
-        }
-        
-        .chart-container,
-        .table-container,
-        .form-container {
-            padding: 16px;
-        }
-        
-        .date-btn {
-            font-size: 11px;
-            padding: 6px 10px;
-        }
-    }
-</style>
-"""
-# Shared Scripts
-SHARED_SCRIPTS = """
-<script>
-// Sidebar toggle for mobile - DEBUGGED VERSION
-function toggleSidebar() {
-    console.log('toggleSidebar called'); // Debug log
-    
-    const sidebar = document.querySelector('.sidebar');
-    const overlay = document.querySelector('.sidebar-overlay');
-    
-    console.log('Sidebar found:', sidebar); // Debug log
-    console.log('Overlay found:', overlay); // Debug log
-    
-    if (sidebar) {
-        sidebar.classList.toggle('open');
-        console.log('Sidebar classes:', sidebar.className); // Debug log
-    }
-    
-    if (overlay) {
-        overlay.classList.toggle('active');
-        console.log('Overlay classes:', overlay.className); // Debug log
-    }
-}
-
-// Close sidebar when clicking overlay
-function closeSidebar() {
-    console.log('closeSidebar called'); // Debug log
-    
-    const sidebar = document.querySelector('.sidebar');
-    const overlay = document.querySelector('.sidebar-overlay');
-    
-    if (sidebar) {
-        sidebar.classList.remove('open');
-    }
-    
-    if (overlay) {
-        overlay.classList.remove('active');
-    }
-}
-
-// Close sidebar when clicking any menu item (mobile only)
-document.addEventListener('DOMContentLoaded', function() {
-    console.log('DOM loaded'); // Debug log
-    
-    const menuItems = document.querySelectorAll('.menu-item');
-    const isMobile = window.innerWidth <= 768;
-    
-    console.log('Menu items found:', menuItems.length); // Debug log
-    console.log('Is mobile:', isMobile); // Debug log
-    
-    if (isMobile) {
-        menuItems.forEach(item => {
-            item.addEventListener('click', function() {
-                setTimeout(closeSidebar, 150);
-            });
-        });
-    }
-});
-
-// Image modal functions
-function openModal(imageSrc) {
-    const modal = document.getElementById('imageModal');
-    const modalImage = document.getElementById('modalImage');
-    
-    if (modal && modalImage) {
-        modal.style.display = 'block';
-        modalImage.src = imageSrc;
-        document.body.style.overflow = 'hidden';
-    }
-}
-
-function closeModal() {
-    const modal = document.getElementById('imageModal');
-    if (modal) {
-        modal.style.display = 'none';
-        document.body.style.overflow = 'auto';
-    }
-}
-
-window.onclick = function(event) {
-    const modal = document.getElementById('imageModal');
-    if (event.target == modal) {
-        closeModal();
-    }
-}
-
-// Close modal on escape key
-document.addEventListener('keydown', function(event) {
-    if (event.key === 'Escape') {
-        closeModal();
-    }
-});
+# Shared CSS and scripts live in static/css/app.css and static/js/app.js; asset_url() gives their
+# content-hashed URL so browsers cache them once instead of receiving them inline with every page
+SIDEBAR_STYLES = """<link rel="stylesheet" href="{{ asset_url('css/app.css') }}">"""
+SHARED_SCRIPTS = """<script src="{{ asset_url('js/app.js') }}"></script>"""
 
-// Clipboard copy helper (device keys)
-function copyDeviceKey(el) {
-    const key = el.getAttribute('data-key');
-    if (!key) return;
-    
-    navigator.clipboard.writeText(key).then(() => {
-        const toast = document.createElement('div');
-        toast.innerText = '✓ Device key copied!';
-        toast.style.cssText = `
-            position: fixed;
-            z-index: 9999;
-            right: 20px;
-            bottom: 20px;
-            padding: 12px 20px;
-            background: rgba(76, 217, 100, 0.9);
-            color: #fff;
-            border-radius: 10px;
-            font-size: 14px;
-            font-weight: 500;
-            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.3);
-            animation: slideInUp 0.3s ease;
-        `;
-        
-        document.body.appendChild(toast);
-        
-        setTimeout(() => {
-            toast.style.animation = 'slideOutDown 0.3s ease';
-            setTimeout(() => toast.remove(), 300);
-        }, 2000);
-    }).catch(err => {
-        alert('Failed to copy: ' + err);
-    });
-}
-
-// Add toast animations
-const style = document.createElement('style');
-style.textContent = `
-    @keyframes slideInUp {
-        from {
-            transform: translateY(100%);
-            opacity: 0;
-        }
-        to {
-            transform: translateY(0);
-            opacity: 1;
-        }
-    }
-    
-    @keyframes slideOutDown {
-        from {
-            transform: translateY(0);
-            opacity: 1;
-        }
-        to {
-            transform: translateY(100%);
-            opacity: 0;
-        }
-    }
-`;
-document.head.appendChild(style);
-</script>
-"""
 # LOGIN TEMPLATE
 LOGIN_HTML = """
 <!DOCTYPE html>
@@ -1225,6 +213,20 @@ LOGIN_HTML = """
 </html>
 """
 
+# Newest / Older links for keyset-paginated lists (expects cursor, first_page_url, next_page_url)
+PAGINATION_BAR = """
+        {% if cursor or next_page_url %}
+        <div class="pagination">
+            {% if cursor %}
+            <a href="{{ first_page_url }}" class="btn btn-secondary"><i class="fas fa-angle-double-left"></i> Newest</a>
+            {% endif %}
+            {% if next_page_url %}
+            <a href="{{ next_page_url }}" class="btn btn-secondary">Older <i class="fas fa-angle-right"></i></a>
+            {% endif %}
+        </div>
+        {% endif %}
+"""
+
 # === ADMIN TEMPLATES ===
 
 def admin_sidebar(active_page):
@@ -1477,6 +479,13 @@ ADMIN_DEVICES_HTML = """
                                     <i class="fas fa-sync"></i> Regenerate Key
                                 </button>
                             </form>
+                            <form method="POST" action="/admin/delete_device" style="display: inline;"
+                                  onsubmit="return confirm('Delete {{ device[1] }}? Uploads with its key will be rejected.');">
+                                <input type="hidden" name="device_id" value="{{ device[0] }}">
+                                <button type="submit" class="btn btn-danger" style="padding: 6px 14px; font-size: 12px;">
+                                    <i class="fas fa-trash"></i> Delete
+                                </button>
+                            </form>
                         </td>
                     </tr>
                     {% endfor %}
@@ -1527,7 +536,7 @@ ADMIN_DEVICE_ANALYTICS_HTML = """
                     <i class="fas fa-bug"></i>
                 </div>
                 <div class="stat-label">Total Detections</div>
-                <div class="stat-value">{{ records|length }}</div>
+                <div class="stat-value">{{ total_detections }}</div>
             </div>
             
             <div class="stat-card">
@@ -1576,7 +585,7 @@ ADMIN_DEVICE_ANALYTICS_HTML = """
                         <td><span class="badge badge-orange">{{ row.count }}</span></td>
                         <td>
                             {% if row.image_url %}
-                                <img src="{{ row.image_url }}" class="image-thumb" onclick="openModal('{{ row.image_url }}')" alt="Detection">
+                                <img src="{{ row.thumb_url or row.image_url }}" class="image-thumb" loading="lazy" decoding="async" onclick="openModal('{{ row.image_url }}')" alt="Detection">
                             {% else %}
                                 <span style="color: rgba(255,255,255,0.3);">No image</span>
                             {% endif %}
@@ -1704,7 +713,7 @@ ADMIN_DATASET_HTML = """
         
         <div class="table-container">
             <div class="chart-header">
-                <h2 class="chart-title"><i class="fas fa-table"></i> Detection Records ({{ records|length }})</h2>
+                <h2 class="chart-title"><i class="fas fa-table"></i> Detection Records ({{ records|length }} on this page)</h2>
             </div>
             
             {% if records|length > 0 %}
@@ -1734,6 +743,7 @@ ADMIN_DATASET_HTML = """
                 <p>No records found</p>
             </div>
             {% endif %}
+            """ + PAGINATION_BAR + """
         </div>
     </div>
     
@@ -1791,8 +801,18 @@ ADMIN_IMAGES_HTML = """
         <div class="form-container">
             <h2 class="chart-title"><i class="fas fa-link"></i> Link Images from Supabase Storage</h2>
             <p style="color: rgba(255, 255, 255, 0.6); font-size: 13px; margin-bottom: 16px;">
-                Select from {{ available_images|length }} images found in your Supabase storage
+                Select from images found in your Supabase storage (newest first, {{ available_images|length }} on this page)
             </p>
+            {% if newer_images_url or older_images_url %}
+            <div class="pagination" style="margin-bottom: 16px;">
+                {% if newer_images_url %}
+                <a href="{{ newer_images_url }}" class="btn btn-secondary"><i class="fas fa-angle-left"></i> Newer images</a>
+                {% endif %}
+                {% if older_images_url %}
+                <a href="{{ older_images_url }}" class="btn btn-secondary">Older images <i class="fas fa-angle-right"></i></a>
+                {% endif %}
+            </div>
+            {% endif %}
             
             {% if available_images and available_images|length > 0 %}
             <form method="POST" action="/admin/create_record_for_image">
@@ -1860,7 +880,9 @@ ADMIN_IMAGES_HTML = """
         <div class="image-gallery">
             {% for row in records %}
             <div class="image-card" onclick="openModal('{{ row.image_url }}')">
-                <img src="{{ row.image_url }}" alt="{{ row.insect }}">
+                <img src="{{ row.thumb_url or row.image_url }}"
+                     {% if row.thumb_url and row.medium_url %}srcset="{{ row.thumb_url }} 320w, {{ row.medium_url }} 1024w" sizes="(max-width: 768px) 100vw, 300px"{% endif %}
+                     loading="lazy" decoding="async" alt="{{ row.insect }}">
                 <div class="image-card-info">
                     <div class="image-card-title">{{ row.insect }}</div>
                     <div class="image-card-meta">
@@ -1877,6 +899,7 @@ ADMIN_IMAGES_HTML = """
             <p>No linked images found</p>
         </div>
         {% endif %}
+        """ + PAGINATION_BAR + """
     </div>
     
     <div id="imageModal" class="modal" onclick="closeModal()">
@@ -2303,7 +1326,7 @@ FARMER_DATASET_HTML = """
         
         <div class="table-container">
             <div class="chart-header">
-                <h2 class="chart-title"><i class="fas fa-table"></i> Detection Records ({{ records|length }})</h2>
+                <h2 class="chart-title"><i class="fas fa-table"></i> Detection Records ({{ records|length }} on this page)</h2>
             </div>
             
             {% if records|length > 0 %}
@@ -2331,6 +1354,7 @@ FARMER_DATASET_HTML = """
                 <p>No records found</p>
             </div>
             {% endif %}
+            """ + PAGINATION_BAR + """
         </div>
     </div>
 </body>
@@ -2373,7 +1397,9 @@ FARMER_IMAGES_HTML = """
         <div class="image-gallery">
             {% for row in records %}
             <div class="image-card" onclick="openModal('{{ row.image_url }}')">
-                <img src="{{ row.image_url }}" alt="{{ row.insect }}">
+                <img src="{{ row.thumb_url or row.image_url }}"
+                     {% if row.thumb_url and row.medium_url %}srcset="{{ row.thumb_url }} 320w, {{ row.medium_url }} 1024w" sizes="(max-width: 768px) 100vw, 300px"{% endif %}
+                     loading="lazy" decoding="async" alt="{{ row.insect }}">
                 <div class="image-card-info">
                     <div class="image-card-title">{{ row.insect }}</div>
                     <div class="image-card-meta">
@@ -2390,6 +1416,7 @@ FARMER_IMAGES_HTML = """
             <p>No images found</p>
         </div>
         {% endif %}
+        """ + PAGINATION_BAR + """
     </div>
     
     <div id="imageModal" class="modal" onclick="closeModal()">
@@ -2403,3 +1430,18 @@ FARMER_IMAGES_HTML = """
 </body>
 </html>
 """
+
+# Page templates by name, served through app.jinja_loader so each is compiled once per worker
+TEMPLATES = {
+    "login.html": LOGIN_HTML,
+    "admin_overview.html": ADMIN_OVERVIEW_HTML,
+    "admin_devices.html": ADMIN_DEVICES_HTML,
+    "admin_device_analytics.html": ADMIN_DEVICE_ANALYTICS_HTML,
+    "admin_dataset.html": ADMIN_DATASET_HTML,
+    "admin_images.html": ADMIN_IMAGES_HTML,
+    "admin_users.html": ADMIN_USERS_HTML,
+    "farmer_overview.html": FARMER_OVERVIEW_HTML,
+    "farmer_analysis.html": FARMER_ANALYSIS_HTML,
+    "farmer_dataset.html": FARMER_DATASET_HTML,
+    "farmer_images.html": FARMER_IMAGES_HTML,
+}
@@ -0,0 +1,218 @@
+# ingest_queue.py - Background image upload pipeline for /api/upload_result
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from dedupe import image_digest
+
+
+class IngestQueue:
+    """
+    Spools uploaded images to local disk and uploads them to storage from a worker pool.
+
+    The request path only validates, spools and records a job (fast acknowledge). A worker then
+    uploads the image (and its derivatives) with retries and writes the insect record with the URLs.
+    Jobs live in the upload_jobs table so any gunicorn worker can answer a status query. Jobs left
+    queued or uploading by a restart, and jobs whose record insert kept failing (insert_failed), are
+    picked up again by resume(), which start() runs periodically. Queries run on the UsersDAO's
+    per-thread connection to users.db (each pool thread gets its own).
+    """
+
+    def __init__(self, db, spool_dir, upload, write_record, workers=2, max_attempts=4, backoff=1.0):
+        self.db = db
+        self.spool_dir = spool_dir
+        self.upload = upload              # upload(filename, path, digest) -> {"image_url", "thumb_url", ...} or None
+        self.write_record = write_record  # write_record(timestamp, farmer_id, detections, image_url, device_id,
+                                          #              population, thumb_url, medium_url) -> bool
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._init_db()
+
+    def _init_db(self):
+        conn = self.db.connection()
+        with conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS upload_jobs (
+                id TEXT PRIMARY KEY,
+                device_id TEXT,
+                farmer_id TEXT,
+                timestamp TEXT,
+                detections TEXT,
+                filename TEXT,
+                spool_path TEXT,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                image_url TEXT,
+                error TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            """)
+            # Columns added after the table was first created
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(upload_jobs)")]
+            if "population" not in columns:
+                conn.execute("ALTER TABLE upload_jobs ADD COLUMN population TEXT")  # tracking devices
+            if "digest" not in columns:
+                conn.execute("ALTER TABLE upload_jobs ADD COLUMN digest TEXT")  # BLAKE2b of the image bytes
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{k}=?" for k in fields)
+        conn = self.db.connection()
+        with conn:
+            conn.execute(f"UPDATE upload_jobs SET {assignments}, updated_at=CURRENT_TIMESTAMP WHERE id=?",
+                         (*fields.values(), job_id))
+
+    def spool_path(self, job_id):
+        return self.spool_dir / f"{job_id}.jpg"
+
+    def submit(self, device_id, farmer_id, timestamp, detections, filename, image, population=None):
+        """
+        Spool the image to disk, record the job and hand it to the worker pool.
+        image is bytes or a readable stream (copied and hashed in chunks). Returns the job id, or None if empty.
+        """
+        job_id = uuid.uuid4().hex
+        path = self.spool_path(job_id)
+        tmp = path.with_suffix(".part")
+        digest = image_digest()
+        with open(tmp, "wb") as f:
+            if isinstance(image, (bytes, bytearray)):
+                f.write(image)
+                digest.update(image)
+            else:
+                while True:
+                    chunk = image.read(64 * 1024)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    digest.update(chunk)
+            size = f.tell()
+        if not size:
+            os.remove(tmp)
+            return None
+        os.replace(tmp, path)
+
+        conn = self.db.connection()
+        with conn:
+            conn.execute("""INSERT INTO upload_jobs (id, device_id, farmer_id, timestamp, detections, population,
+                                                     filename, spool_path, digest, status)
+                            VALUES (?,?,?,?,?,?,?,?,?,?)""",
+                         (job_id, str(device_id) if device_id else None, farmer_id, timestamp,
+                          json.dumps(detections), json.dumps(population) if population is not None else None,
+                          filename, str(path), digest.hexdigest(), "queued"))
+
+        self.pool.submit(self._run, job_id)
+        return job_id
+
+    def status(self, job_id):
+        # The connection is shared with the other users.db stores, so build the dict here instead of
+        # setting a row_factory on it
+        cur = self.db.connection().execute("""SELECT id, device_id, farmer_id, timestamp, status, attempts,
+                                                     image_url, error, created_at, updated_at
+                                              FROM upload_jobs WHERE id=?""", (job_id,))
+        rows = cur.fetchall()
+        if not rows:
+            return None
+        return dict(zip((column[0] for column in cur.description), rows[0]))
+
+    def start(self, interval=60, stale_after=timedelta(minutes=10), retry_for=timedelta(days=1)):
+        """Resume left-behind jobs now, then again every `interval` seconds from a daemon thread"""
+        self.resume(stale_after, retry_for)
+
+        def sweep():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.resume(stale_after, retry_for)
+                except Exception as e:
+                    print(f"Ingest resume error: {e}")
+
+        threading.Thread(target=sweep, name="ingest-resume", daemon=True).start()
+
+    def resume(self, stale_after=timedelta(minutes=10), retry_for=timedelta(days=1)):
+        """
+        Re-queue jobs left behind by a restart (queued, or stuck uploading for longer than stale_after)
+        and insert_failed jobs created within retry_for; older insert failures are left for inspection.
+        """
+        now = datetime.utcnow()
+        conn = self.db.connection()
+        with conn:
+            conn.execute("UPDATE upload_jobs SET status='queued' WHERE status='uploading' AND updated_at < ?",
+                         ((now - stale_after).strftime("%Y-%m-%d %H:%M:%S"),))
+            conn.execute("UPDATE upload_jobs SET status='queued' WHERE status='insert_failed' AND created_at >= ?",
+                         ((now - retry_for).strftime("%Y-%m-%d %H:%M:%S"),))
+        job_ids = [r[0] for r in conn.execute("SELECT id FROM upload_jobs WHERE status='queued' ORDER BY created_at")]
+        for job_id in job_ids:
+            self.pool.submit(self._run, job_id)
+        return len(job_ids)
+
+    def _claim(self, job_id):
+        """Atomically move a job from queued to uploading so only one worker/process runs it"""
+        conn = self.db.connection()
+        with conn:
+            cur = conn.execute("UPDATE upload_jobs SET status='uploading', updated_at=CURRENT_TIMESTAMP "
+                               "WHERE id=? AND status='queued'", (job_id,))
+        if cur.rowcount != 1:
+            return None
+        rows = conn.execute("SELECT device_id, farmer_id, timestamp, detections, population, filename, spool_path, "
+                            "digest FROM upload_jobs WHERE id=?", (job_id,)).fetchall()
+        return rows[0] if rows else None
+
+    def _run(self, job_id):
+        try:
+            job = self._claim(job_id)
+            if not job:
+                return
+            device_id, farmer_id, timestamp, detections, population, filename, spool_path, digest = job
+
+            urls, image_url, error = {}, None, None
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    urls = self.upload(filename, spool_path, digest) or {}
+                    image_url = urls.get("image_url")
+                    error = None if image_url else "image upload failed"
+                except Exception as e:
+                    error = str(e)
+                self._update(job_id, attempts=attempt, error=error)
+                if image_url:
+                    break
+                if attempt < self.max_attempts:
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+
+            # The detections are recorded even when the image never made it to storage. The device dropped
+            # its copy on the 202, so a failed insert is retried here and then again by resume().
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    inserted = self.write_record(timestamp, farmer_id, json.loads(detections), image_url or "",
+                                                 device_id=device_id,
+                                                 population=json.loads(population) if population else None,
+                                                 thumb_url=urls.get("thumb_url"), medium_url=urls.get("medium_url"))
+                except Exception as e:
+                    print(f"Ingest job {job_id} insert error: {e}")
+                    inserted = False
+                if inserted:
+                    break
+                self._update(job_id, error=f"record insert failed (attempt {attempt})")
+                if attempt < self.max_attempts:
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+            else:
+                # Keep the spooled image: the re-run finds the upload in the image index and only re-inserts
+                self._update(job_id, status="insert_failed")
+                return
+            if image_url:
+                self._update(job_id, status="done", image_url=image_url, error=None)
+                try:
+                    os.remove(spool_path)
+                except OSError:
+                    pass
+            else:
+                # Keep the spooled image so it can be inspected or re-sent by hand
+                self._update(job_id, status="failed", error=error)
+        except Exception as e:
+            print(f"Ingest job {job_id} error: {e}")
+            self._update(job_id, status="failed", error=str(e))
@@ -0,0 +1,115 @@
+# record_cache.py - In-process TTL + LRU cache for Supabase record queries
+import threading
+import time
+from collections import OrderedDict
+
+
+class RecordCache:
+    """
+    Caches query results keyed by (kind, farmer_id, device_id, window).
+    Entries expire after `ttl` seconds; the least recently used entry is evicted beyond `maxsize`.
+    Writes call invalidate() for the affected farmer/device so the next view re-queries; a load that was
+    already running when its key was invalidated returns its result but doesn't cache it.
+    The cache lives per worker process: other gunicorn workers see a write after at most `ttl`.
+    """
+
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._loading = {}      # key -> loads in flight
+        self._generations = {}  # key -> invalidation count, kept while a load of the key is in flight
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(kind, farmer_id, device_id, window):
+        return (kind, farmer_id or None, str(device_id) if device_id else None, window)
+
+    def get_or_load(self, kind, farmer_id, device_id, window, loader):
+        """Return the cached value for the key, or call loader() and cache its result (not its errors)"""
+        key = self.make_key(kind, farmer_id, device_id, window)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            self._loading[key] = self._loading.get(key, 0) + 1
+            generation = self._generations.setdefault(key, 0)
+
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                self._done_loading(key)
+            raise
+
+        with self._lock:
+            # An invalidate() during the load means the result may predate the write: don't serve it for a TTL
+            if self._generations[key] == generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            self._done_loading(key)
+        return value
+
+    def _done_loading(self, key):
+        self._loading[key] -= 1
+        if not self._loading[key]:
+            del self._loading[key]
+            del self._generations[key]
+
+    @staticmethod
+    def _affected(key, farmer_id, device_id):
+        return ((key[1] is None and key[2] is None)
+                or (farmer_id and key[1] == farmer_id)
+                or (device_id and key[2] == device_id))
+
+    def invalidate(self, farmer_id=None, device_id=None):
+        """Drop entries that could contain rows written for this farmer/device (plus unfiltered ones)"""
+        device_id = str(device_id) if device_id else None
+        with self._lock:
+            stale = [key for key in self._entries if self._affected(key, farmer_id, device_id)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            for key in self._generations:
+                if self._affected(key, farmer_id, device_id):
+                    self._generations[key] += 1
+
+    def discard(self, kind, farmer_id, device_id, window):
+        """Drop the one entry for this key (and keep an in-flight load of it from being cached)"""
+        key = self.make_key(kind, farmer_id, device_id, window)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+            if key in self._generations:
+                self._generations[key] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for key in self._generations:
+                self._generations[key] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
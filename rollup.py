@@ -0,0 +1,65 @@
+# rollup.py - Per-day / per-insect detection rollup (insect_daily_rollup table in Supabase)
+from aggregation import records_frame, to_rollup_rows
+
+ROLLUP_TABLE = "insect_daily_rollup"
+# PostgREST returns at most 1000 rows per request by default, so reads are paged in this size
+PAGE_SIZE = 1000
+
+
+def rollup_rows(records):
+    """
+    Collapse raw insect_records into rollup rows keyed by (farmer_id, device_id, day, insect).
+    device_id is "" for records that were not posted by a device (e.g. admin-created records).
+    Callers that already parsed the timestamp can pass its UTC day as "day" on each record.
+    """
+    return to_rollup_rows(records_frame(records))
+
+
+def apply_rollup(client, records):
+    """
+    Incrementally add freshly inserted records to the rollup (atomic server-side upsert).
+    Returns False when the rollup could not be updated; the raw records are already stored, so the
+    affected days then have to be rebuilt with `python backfill_rollup.py --since <first day>`.
+    """
+    deltas = rollup_rows(records)
+    if not deltas:
+        return True
+    try:
+        client.rpc("increment_insect_rollup", {"deltas": deltas}).execute()
+        return True
+    except Exception as e:
+        first_day = min(d["day"] for d in deltas)
+        print(f"Rollup update error: {e} - rollup is missing {len(records)} record(s); "
+              f"reconcile with: python backfill_rollup.py --since {first_day}")
+        return False
+
+
+def load_rollup(client, farmer_id=None, device_id=None, since_day=None):
+    """
+    Load rollup rows, optionally filtered by farmer, device and first day (YYYY-MM-DD).
+    Returns None when the rollup table can't be read so callers can fall back to raw records.
+    """
+    rows = []
+    try:
+        while True:
+            query = client.table(ROLLUP_TABLE).select("farmer_id,device_id,day,insect,count")
+            if device_id:
+                query = query.eq("device_id", str(device_id))
+            if farmer_id:
+                query = query.eq("farmer_id", farmer_id)
+            if since_day:
+                query = query.gte("day", since_day)
+            # Order by the whole primary key (one comma-joined order; PostgREST keeps a single order param)
+            # so pages don't overlap or skip rows. limit/offset rather than range(): postgrest 0.14 treats
+            # range()'s end as exclusive, newer releases as inclusive.
+            res = query.order("day,farmer_id,device_id,insect") \
+                .limit(PAGE_SIZE) \
+                .offset(len(rows)) \
+                .execute()
+            page = res.data or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+    except Exception as e:
+        print(f"Rollup load error: {e}")
+        return None
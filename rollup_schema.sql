@@ -0,0 +1,33 @@
+-- rollup_schema.sql - run once in the Supabase SQL editor, then `python backfill_rollup.py`
+
+CREATE TABLE IF NOT EXISTS insect_daily_rollup (
+    farmer_id TEXT NOT NULL,
+    device_id TEXT NOT NULL DEFAULT '',
+    day DATE NOT NULL,
+    insect TEXT NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (farmer_id, device_id, day, insect)
+);
+
+CREATE INDEX IF NOT EXISTS insect_daily_rollup_device_idx ON insect_daily_rollup (device_id, day);
+
+-- Atomically add a batch of {farmer_id, device_id, day, insect, count} deltas (called on ingest)
+CREATE OR REPLACE FUNCTION increment_insect_rollup(deltas JSONB)
+RETURNS VOID
+LANGUAGE SQL
+AS $$
+    INSERT INTO insect_daily_rollup AS r (farmer_id, device_id, day, insect, count)
+    SELECT d->>'farmer_id', COALESCE(d->>'device_id', ''), (d->>'day')::DATE, d->>'insect', (d->>'count')::BIGINT
+    FROM jsonb_array_elements(deltas) AS d
+    ON CONFLICT (farmer_id, device_id, day, insect)
+    DO UPDATE SET count = r.count + EXCLUDED.count;
+$$;
+
+-- Standing population reported by tracking devices ({insect: count} currently on the trap).
+-- On those devices insect_records.detections holds only new arrivals, so the rollup keeps
+-- summing arrivals. Run this before updating the devices: inserts with population fail without it.
+ALTER TABLE insect_records ADD COLUMN IF NOT EXISTS population JSONB;
+
+-- Downscaled previews stored next to each uploaded image (galleries load these instead of the original)
+ALTER TABLE insect_records ADD COLUMN IF NOT EXISTS thumb_url TEXT;
+ALTER TABLE insect_records ADD COLUMN IF NOT EXISTS medium_url TEXT;
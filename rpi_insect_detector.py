@@ -7,8 +7,17 @@ Captures images, runs YOLO detection, and uploads to Supabase via Flask API
 
 import os
 import sys
+import argparse
 import time
+import queue
 import base64
+import json
+import hashlib
+import random
+import signal
+import sqlite3
+import threading
+from collections import deque, namedtuple
 from datetime import datetime
 
 import cv2
@@ -34,12 +43,66 @@ CONFIDENCE_THRESHOLD = 0.5
 CAMERA_RESOLUTION = (854, 480)  # Width x Height
 CAMERA_PREVIEW = True  # Show live preview window
 
+# Tiled inference (--tiled): capture at a higher resolution and run the model on overlapping
+# tiles in one batch, so few-pixel insects (whiteflies, thrips) are not lost to downscaling
+TILED_INFERENCE = False
+TILED_CAPTURE_RESOLUTION = (1920, 1080)
+TILE_SIZE = 640              # square tiles, matching the model input size
+TILE_OVERLAP = 64            # pixels shared by neighbouring tiles; keep above the largest insect
+NMS_IOU_THRESHOLD = 0.5      # duplicates across tile seams are merged above this overlap
+# Region of interest as fractions of the frame (x0, y0, x1, y1); detections centred outside it
+# (trap borders, clips, frame) are ignored and tiles outside it are not run. None = whole frame
+ROI = None
+
 # Camera color / AWB
 AWB_MODE = 4  # 4 = Daylight ; adjust if needed
 USE_COLOR_CORRECTION = True
+COLOR_GAINS = (0.95, 1.0, 1.05)  # software B, G, R multipliers (reduce the blue tint)
 
 # API Endpoint (must be the same as your working manual POST)
 API_ENDPOINT = "https://jpglobal-ai.onrender.com/api/upload_result"
+# "multipart" sends the JPEG as a binary file part (~33% smaller than base64);
+# "json" is the legacy base64-in-JSON payload for older servers
+UPLOAD_MODE = "multipart"
+API_BATCH_ENDPOINT = API_ENDPOINT.replace("/api/upload_result", "/api/upload_batch")
+
+# Offline spool: captures are queued on disk and sent in batches by a background thread,
+# so nothing is lost while the network is down and the capture loop never waits on it
+SPOOL_DIR = "/home/jpglobal/insect_spool"
+SPOOL_MAX_ITEMS = 5000                  # oldest captures are evicted beyond this...
+SPOOL_MAX_BYTES = 2 * 1024 ** 3         # ...or beyond this much image data
+UPLOAD_BATCH_SIZE = 20
+UPLOAD_BACKOFF_MIN = 2                  # seconds; doubles after each failed attempt
+UPLOAD_BACKOFF_MAX = 300
+
+# Pipeline: camera, inference and preview/upload run in separate threads joined by
+# bounded queues; when a stage falls behind, its oldest pending frame is dropped
+PIPELINE_QUEUE_SIZE = 1
+STATS_INTERVAL = 10  # seconds between FPS / per-stage latency reports (0 = off)
+RESULT_HISTORY = 30  # inferred frames kept for [SPACE]/[S]; [,] and [.] step through them
+
+# Headless service mode (--headless): no window or keyboard, captures run on a schedule
+CAPTURE_INTERVAL = 60        # seconds between scheduled captures
+CAPTURE_WINDOW = ""          # local-time windows, e.g. "06:00-12:00,14:00-20:00" ("" = always)
+HEADLESS_DRAW = False        # draw boxes on uploaded images (extra CPU per capture)
+# Motion gate (live preview and headless): YOLO only runs when the scene (inside the ROI) differs from
+# a running background model, or after MOTION_MAX_INTERVAL; otherwise the last result is reused
+MOTION_GATE = True
+MOTION_SCALE = 2             # frames are compared in greyscale at 1/MOTION_SCALE of the capture size
+MOTION_PIXEL_DELTA = 25      # grey-level difference from the background that marks a pixel as changed
+MOTION_MIN_PIXELS = 4        # changed pixels that trigger inference: about one whitefly at MOTION_SCALE 2
+MOTION_MAX_INTERVAL = 300    # seconds; inference runs at least this often regardless
+MOTION_LEARNING_RATE = 0.05  # weight of each new frame in the background average
+
+# Tracking: insects stuck on the trap keep one ID across captures, so uploads report new
+# arrivals ("detections") separately from the standing population on the trap
+TRACK_IOU_THRESHOLD = 0.3    # boxes overlapping at least this much are the same insect
+TRACK_MAX_DISTANCE = 20      # pixels; small boxes whose centres moved less than this also match
+TRACK_MAX_UNSEEN = 300       # seconds an insect may go undetected before it is considered gone (time, not
+                             # frames: live inference runs several times a second, so brief flickers are common)
+
+# Manual saves ([S] key) go here instead of the working directory
+LOCAL_SAVE_DIR = "/home/jpglobal/insect_captures"
 
 # Insect Label Mapping (update if your model label order differs)
 INSECT_MAPPING = {
@@ -50,13 +113,669 @@ INSECT_MAPPING = {
     4: "fungus gnats"
 }
 
+# =============================================================================
+# UPLOAD HELPERS
+# =============================================================================
+
+def spool_key(item_id, timestamp):
+    """Stable Idempotency-Key for a spooled capture, so a retried upload is not recorded twice"""
+    return f"capture-{timestamp}-{item_id}"
+
+
+def post_capture(jpeg_bytes, insect_counts, population=None, idempotency_key=None):
+    """Send one capture to /api/upload_result (used when the server has no batch endpoint)"""
+    payload = {
+        "insect": max(insect_counts, key=insect_counts.get) if insect_counts else "",
+        "count": sum(insect_counts.values()),
+        "detections": insect_counts
+    }
+    if population is not None:
+        payload["population"] = population
+
+    headers = {}
+    if USE_DEVICE_KEY and DEVICE_KEY:
+        headers["Device-Key"] = DEVICE_KEY
+    else:
+        # Include farmer_id as fallback if device key not used
+        payload["farmer_id"] = FARMER_ID
+    if idempotency_key:
+        headers["Idempotency-Key"] = idempotency_key
+
+    try:
+        if UPLOAD_MODE == "multipart":
+            # Form fields must be strings; the JPEG bytes go out as-is in the "image" part
+            form = {k: json.dumps(v) if isinstance(v, dict) else str(v) for k, v in payload.items()}
+            files = {"image": ("capture.jpg", jpeg_bytes, "image/jpeg")} if jpeg_bytes else None
+            response = requests.post(API_ENDPOINT, data=form, files=files, headers=headers, timeout=30)
+        else:
+            if jpeg_bytes:
+                payload["image_base64"] = base64.b64encode(jpeg_bytes).decode('utf-8')
+            response = requests.post(API_ENDPOINT, json=payload, headers=headers, timeout=30)
+    except requests.exceptions.RequestException as e:
+        print(f"✗ Upload error: {e}")
+        return False
+
+    # 202 = accepted; the server uploads the image in the background (see job_id)
+    if response.status_code in (200, 202):
+        return True
+    print(f"✗ Upload failed: {response.status_code}")
+    print(f"   Error: {response.text}")
+    return False
+
+# =============================================================================
+# CLASS: OfflineSpool
+# =============================================================================
+
+class OfflineSpool:
+    """Durable FIFO of captures waiting for upload: SQLite index + one JPEG file per item"""
+
+    def __init__(self, spool_dir=SPOOL_DIR, max_items=SPOOL_MAX_ITEMS, max_bytes=SPOOL_MAX_BYTES):
+        self.image_dir = os.path.join(spool_dir, "images")
+        self.dead_letter_dir = os.path.join(spool_dir, "dead_letter")
+        os.makedirs(self.image_dir, exist_ok=True)
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(spool_dir, "queue.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            detections TEXT,
+            image_path TEXT,
+            size INTEGER,
+            attempts INTEGER DEFAULT 0
+        );
+        """)
+        # Spools created before tracking have no population column
+        if "population" not in [row[1] for row in self.conn.execute("PRAGMA table_info(items)")]:
+            self.conn.execute("ALTER TABLE items ADD COLUMN population TEXT")
+        self.conn.commit()
+        self.has_items = threading.Event()
+        if self.count():
+            self.has_items.set()
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def enqueue(self, jpeg_bytes, detections, timestamp=None, population=None):
+        """Persist one capture (image written first, then indexed) and evict the oldest beyond the caps"""
+        timestamp = timestamp or datetime.utcnow().isoformat() + "+00:00"
+        image_path = None
+        if jpeg_bytes is not None:
+            image_path = os.path.join(self.image_dir, f"{datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')}.jpg")
+            with open(image_path + ".part", "wb") as f:
+                f.write(jpeg_bytes)
+            os.replace(image_path + ".part", image_path)
+        with self.lock:
+            self.conn.execute("INSERT INTO items (timestamp, detections, population, image_path, size) VALUES (?,?,?,?,?)",
+                              (timestamp, json.dumps(detections),
+                               json.dumps(population) if population is not None else None,
+                               image_path, len(jpeg_bytes or b"")))
+            self.conn.commit()
+            self._evict()
+        self.has_items.set()
+
+    def _evict(self):
+        count, total = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM items").fetchone()
+        evicted = []
+        for item_id, image_path, size in self.conn.execute("SELECT id, image_path, size FROM items ORDER BY id"):
+            if count <= self.max_items and total <= self.max_bytes:
+                break
+            evicted.append((item_id, image_path))
+            count -= 1
+            total -= size
+        if evicted:
+            print(f"⚠ Spool full - dropping {len(evicted)} oldest capture(s)")
+            self._delete(evicted)
+
+    def _delete(self, items):
+        self.conn.executemany("DELETE FROM items WHERE id=?", [(item_id,) for item_id, _ in items])
+        self.conn.commit()
+        for _, image_path in items:
+            if image_path:
+                try:
+                    os.remove(image_path)
+                except OSError:
+                    pass
+
+    def peek(self, limit):
+        """Oldest items first: [(id, timestamp, detections, population, image_path)]"""
+        with self.lock:
+            rows = self.conn.execute("SELECT id, timestamp, detections, population, image_path FROM items "
+                                     "ORDER BY id LIMIT ?", (limit,)).fetchall()
+        return [(item_id, ts, json.loads(dets), json.loads(pop) if pop else None, path)
+                for item_id, ts, dets, pop, path in rows]
+
+    def remove(self, item_ids):
+        with self.lock:
+            paths = dict(self.conn.execute(
+                f"SELECT id, image_path FROM items WHERE id IN ({','.join('?' * len(item_ids))})", item_ids).fetchall())
+            self._delete(list(paths.items()))
+            if not self.conn.execute("SELECT 1 FROM items LIMIT 1").fetchone():
+                self.has_items.clear()
+
+    def dead_letter(self, items, reason):
+        """
+        Take items the server will never accept out of the queue without losing them: their images move to
+        dead_letter/ and one JSON line per item (with the reason) is appended to dead_letter/items.jsonl
+        """
+        os.makedirs(self.dead_letter_dir, exist_ok=True)
+        with self.lock:
+            with open(os.path.join(self.dead_letter_dir, "items.jsonl"), "a") as f:
+                for item_id, timestamp, detections, population, image_path in items:
+                    if image_path and os.path.exists(image_path):
+                        moved = os.path.join(self.dead_letter_dir, os.path.basename(image_path))
+                        os.replace(image_path, moved)
+                        image_path = moved
+                    f.write(json.dumps({"timestamp": timestamp, "detections": detections, "population": population,
+                                        "image_path": image_path, "reason": reason}) + "\n")
+            self._delete([(item[0], None) for item in items])
+            if not self.conn.execute("SELECT 1 FROM items LIMIT 1").fetchone():
+                self.has_items.clear()
+
+    def mark_attempt(self, item_ids):
+        with self.lock:
+            self.conn.executemany("UPDATE items SET attempts = attempts + 1 WHERE id=?", [(i,) for i in item_ids])
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+# =============================================================================
+# CLASS: UploadSender
+# =============================================================================
+
+class UploadSender(threading.Thread):
+    """Background thread draining the OfflineSpool to /api/upload_batch with exponential backoff"""
+
+    def __init__(self, spool, batch_size=UPLOAD_BATCH_SIZE):
+        super().__init__(name="upload-sender", daemon=True)
+        self.spool = spool
+        self.batch_size = batch_size
+        self.stop_event = threading.Event()
+        self.backoff = UPLOAD_BACKOFF_MIN
+
+    def stop(self):
+        self.stop_event.set()
+        self.spool.has_items.set()  # wake the thread so it sees the stop flag
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.spool.has_items.wait(timeout=30)
+            if self.stop_event.is_set():
+                break
+            batch = self.spool.peek(self.batch_size)
+            if not batch:
+                continue
+            if self.send(batch):
+                self.backoff = UPLOAD_BACKOFF_MIN
+            else:
+                # Jitter keeps a fleet of traps from retrying in lockstep after an outage
+                delay = self.backoff * random.uniform(0.8, 1.2)
+                print(f"⚠ Upload failed - {self.spool.count()} capture(s) spooled, retrying in {delay:.0f}s")
+                self.stop_event.wait(delay)
+                self.backoff = min(self.backoff * 2, UPLOAD_BACKOFF_MAX)
+
+    def send(self, batch):
+        """Upload one batch; returns False when it should be retried after a backoff"""
+        headers = {}
+        if USE_DEVICE_KEY and DEVICE_KEY:
+            headers["Device-Key"] = DEVICE_KEY
+
+        # Same batch after a lost response -> same key, so the server replays instead of re-inserting
+        keys = "|".join(spool_key(item[0], item[1]) for item in batch)
+        headers["Idempotency-Key"] = "batch-" + hashlib.blake2b(keys.encode(), digest_size=16).hexdigest()
+
+        records, files, handles = [], {}, []
+        try:
+            for item_id, timestamp, detections, population, image_path in batch:
+                record = {"timestamp": timestamp, "detections": detections}
+                if population is not None:
+                    record["population"] = population
+                if image_path and os.path.exists(image_path):
+                    part = f"image_{item_id}"
+                    handle = open(image_path, "rb")
+                    handles.append(handle)
+                    files[part] = (os.path.basename(image_path), handle, "image/jpeg")
+                    record["image"] = part
+                records.append(record)
+
+            response = requests.post(API_BATCH_ENDPOINT, data={"records": json.dumps(records)},
+                                     files=files or None, headers=headers, timeout=120)
+        except requests.exceptions.RequestException as e:
+            print(f"✗ Upload error: {e}")
+            return False
+        finally:
+            for handle in handles:
+                handle.close()
+
+        if response.status_code == 404:
+            # Older server without /api/upload_batch: fall back to one request per capture
+            return self.send_each(batch)
+        if response.status_code in (400, 413) and "Device-Key" not in response.text:
+            # Retrying the same batch can't succeed (a missing Device-Key is a configuration problem and is
+            # retried below like any other failure). Split it to isolate the capture(s) the server refuses
+            # (413: over its upload size limit), then set those aside so the rest of the spool moves on.
+            if len(batch) > 1:
+                half = len(batch) // 2
+                print(f"⚠ Batch of {len(batch)} rejected ({response.status_code}) - splitting")
+                return self.send(batch[:half]) and self.send(batch[half:])
+            reason = f"{response.status_code} {response.text[:200]}"
+            print(f"✗ Batch rejected ({reason}) - moved {len(batch)} capture(s) to {self.spool.dead_letter_dir}")
+            self.spool.dead_letter(batch, reason)
+            return True
+        if response.status_code not in (200, 207):
+            print(f"✗ Batch upload failed: {response.status_code} {response.text[:200]}")
+            return False
+
+        uploaded, done, retry = 0, [], []
+        for result in response.json().get("results", []):
+            item_id = batch[result["index"]][0]
+            if result.get("status") == "ok":
+                uploaded += 1
+                done.append(item_id)
+            elif result.get("retryable") or result.get("error") == "image upload failed":
+                retry.append(item_id)  # server-side storage hiccup: keep the capture
+            else:
+                print(f"✗ Capture rejected by server, dropping: {result.get('error')}")
+                done.append(item_id)
+        if done:
+            self.spool.remove(done)
+        if retry:
+            self.spool.mark_attempt(retry)
+        print(f"✓ Uploaded {uploaded} capture(s); {self.spool.count()} still spooled")
+        return not retry
+
+    def send_each(self, batch):
+        for item_id, timestamp, detections, population, image_path in batch:
+            jpeg_bytes = None
+            if image_path and os.path.exists(image_path):
+                with open(image_path, "rb") as f:
+                    jpeg_bytes = f.read()
+            if not post_capture(jpeg_bytes, detections, population, spool_key(item_id, timestamp)):
+                return False
+            self.spool.remove([item_id])
+        return True
+
+# =============================================================================
+# PIPELINE HELPERS
+# =============================================================================
+
+# One inferred frame travelling from the inference thread to the preview/upload stage.
+# The raw camera frame is not kept: it is a pooled buffer that the camera reuses.
+# inferred is False when the motion gate reused an earlier frame's detections for this one.
+FrameResult = namedtuple("FrameResult", ["frame_id", "captured_at", "detections", "counts", "annotated", "inferred"])
+
+
+def put_latest(q, item, stats=None, stage=None, on_drop=None):
+    """Put item on a bounded queue, discarding the oldest queued item if it is full (stale frames)"""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                dropped = q.get_nowait()
+                if stats:
+                    stats.drop(stage)
+                if on_drop:
+                    on_drop(dropped)
+            except queue.Empty:
+                pass
+
+
+class PipelineStats:
+    """Per-stage throughput (FPS), mean latency and dropped-frame counters, reported periodically"""
+
+    def __init__(self, interval=STATS_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self._reset(time.monotonic())
+
+    def _reset(self, now):
+        self.started = now
+        self.counts = {}
+        self.busy = {}
+        self.drops = {}
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+            self.busy[stage] = self.busy.get(stage, 0.0) + seconds
+
+    def drop(self, stage):
+        with self.lock:
+            self.drops[stage] = self.drops.get(stage, 0) + 1
+
+    def maybe_report(self):
+        """Print and reset the counters once per interval; True when a report was printed"""
+        if not self.interval:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            elapsed = now - self.started
+            if elapsed < self.interval:
+                return False
+            parts = []
+            for stage, count in self.counts.items():
+                parts.append(f"{stage}: {count / elapsed:.1f} fps, {1000 * self.busy[stage] / count:.0f} ms")
+            for stage, count in self.drops.items():
+                parts.append(f"{stage} dropped: {count}")
+            self._reset(now)
+        print("📊 " + " | ".join(parts))
+        return True
+
+# =============================================================================
+# TILING / POST-PROCESSING
+# =============================================================================
+
+def tile_origins(length, tile, overlap):
+    """Start offsets of tiles covering [0, length) with at least `overlap` pixels shared"""
+    if length <= tile:
+        return [0]
+    stride = tile - overlap
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)  # last tile flush with the edge
+    return starts
+
+
+def roi_box(shape, roi=ROI):
+    """ROI in pixels (x0, y0, x1, y1) for a frame shape; the whole frame when roi is None"""
+    height, width = shape[:2]
+    if roi is None:
+        return 0, 0, width, height
+    x0, y0, x1, y1 = roi
+    return int(x0 * width), int(y0 * height), int(x1 * width), int(y1 * height)
+
+
+def nms(boxes, scores, iou_threshold=NMS_IOU_THRESHOLD):
+    """Greedy non-maximum suppression; returns the indices of the boxes kept, best first"""
+    x0, y0, x1, y1 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x1 - x0) * (y1 - y0)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        width = np.clip(np.minimum(x1[best], x1[rest]) - np.maximum(x0[best], x0[rest]), 0, None)
+        height = np.clip(np.minimum(y1[best], y1[rest]) - np.maximum(y0[best], y0[rest]), 0, None)
+        inter = width * height
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.intp)
+
+# =============================================================================
+# CLASS: InsectTracker
+# =============================================================================
+
+class InsectTracker:
+    """
+    IoU / centroid tracker for (mostly stationary) insects on a sticky trap.
+    Every track is reported once as an arrival; the population is all tracks currently on the trap.
+    update() runs on the inference thread while report() is called when uploading, hence the lock.
+    """
+
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD, max_distance=TRACK_MAX_DISTANCE,
+                 max_unseen=TRACK_MAX_UNSEEN):
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.max_unseen = max_unseen
+        self.lock = threading.Lock()
+        self.tracks = {}  # id -> {"insect", "bbox", "last_seen", "reported"}
+        self.next_id = 1
+
+    @staticmethod
+    def _affinity(track_boxes, boxes, iou_threshold, max_distance):
+        """Tracks x detections match strength: IoU, or a small centroid-distance score for tiny boxes"""
+        x0 = np.maximum(track_boxes[:, None, 0], boxes[None, :, 0])
+        y0 = np.maximum(track_boxes[:, None, 1], boxes[None, :, 1])
+        x1 = np.minimum(track_boxes[:, None, 2], boxes[None, :, 2])
+        y1 = np.minimum(track_boxes[:, None, 3], boxes[None, :, 3])
+        inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+        area = lambda b: (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+        iou = inter / (area(track_boxes)[:, None] + area(boxes)[None, :] - inter + 1e-9)
+
+        centres = lambda b: np.stack([(b[:, 0] + b[:, 2]) / 2, (b[:, 1] + b[:, 3]) / 2], axis=1)
+        distance = np.linalg.norm(centres(track_boxes)[:, None, :] - centres(boxes)[None, :, :], axis=2)
+        near = 1e-3 * (1 - distance / max_distance)
+        return np.where(iou >= iou_threshold, iou, np.where(distance <= max_distance, near, 0.0))
+
+    def update(self, detections, now=None):
+        """Match one analysed frame's detections to the tracks (greedy, same insect type only)"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            track_ids = list(self.tracks)
+            matched = set()
+            if track_ids and detections:
+                track_boxes = np.array([self.tracks[t]["bbox"] for t in track_ids], dtype=np.float32)
+                boxes = np.array([d["bbox"] for d in detections], dtype=np.float32)
+                affinity = self._affinity(track_boxes, boxes, self.iou_threshold, self.max_distance)
+                same = np.array([[self.tracks[t]["insect"] == d["insect"] for d in detections] for t in track_ids])
+                affinity[~same] = 0
+                while affinity.size and affinity.max() > 0:
+                    row, col = np.unravel_index(affinity.argmax(), affinity.shape)
+                    track = self.tracks[track_ids[row]]
+                    track["bbox"], track["last_seen"] = detections[col]["bbox"], now
+                    matched.add(track_ids[row])
+                    affinity[row, :] = 0
+                    affinity[:, col] = 0
+                    detections = detections[:col] + [None] + detections[col + 1:]
+
+            for track_id in track_ids:
+                if track_id not in matched and now - self.tracks[track_id]["last_seen"] > self.max_unseen:
+                    del self.tracks[track_id]
+            for det in detections:
+                if det is not None:
+                    self.tracks[self.next_id] = {"insect": det["insect"], "bbox": det["bbox"],
+                                                 "last_seen": now, "reported": False}
+                    self.next_id += 1
+
+    def report(self):
+        """(arrivals not yet reported, standing population) as {insect: count}; marks arrivals reported"""
+        arrivals, population = {}, {}
+        with self.lock:
+            for track in self.tracks.values():
+                population[track["insect"]] = population.get(track["insect"], 0) + 1
+                if not track["reported"]:
+                    arrivals[track["insect"]] = arrivals.get(track["insect"], 0) + 1
+                    track["reported"] = True
+        return arrivals, population
+
+# =============================================================================
+# COLOR CORRECTION
+# =============================================================================
+
+def build_color_lut(gains):
+    """256-entry B, G, R lookup table (shape 1x256x3) equivalent to clip(value * gain) on float32"""
+    values = np.arange(256, dtype=np.float32)
+    lut = np.empty((1, 256, 3), dtype=np.uint8)
+    for channel, gain in enumerate(gains):
+        lut[0, :, channel] = np.clip(values * np.float32(gain), 0, 255).astype(np.uint8)
+    return lut
+
+
+class ColorCorrector:
+    """
+    BGRA -> BGR conversion and per-channel gains written into preallocated BGR buffers.
+
+    Buffers are handed out by apply() and returned with release() once a frame has been
+    processed, so steady-state capture allocates nothing. If every buffer is still in use
+    a new one is allocated rather than blocking the camera.
+    """
+
+    def __init__(self, gains=COLOR_GAINS, enabled=USE_COLOR_CORRECTION, buffers=PIPELINE_QUEUE_SIZE + 2):
+        self.lut = build_color_lut(gains)
+        self.enabled = enabled and any(gain != 1.0 for gain in gains)
+        self.buffers = buffers
+        self.shape = None
+        self.free = queue.Queue()
+
+    def apply(self, frame_bgra):
+        shape = frame_bgra.shape[:2] + (3,)
+        if shape != self.shape:
+            self.shape = shape
+            self.free = queue.Queue()
+        try:
+            frame = self.free.get_nowait()
+        except queue.Empty:
+            frame = np.empty(shape, dtype=np.uint8)
+        cv2.cvtColor(frame_bgra, cv2.COLOR_BGRA2BGR, dst=frame)
+        if self.enabled:
+            cv2.LUT(frame, self.lut, dst=frame)
+        return frame
+
+    def release(self, frame):
+        """Return a frame from apply() to the pool once nothing reads it any more"""
+        if frame.shape == self.shape and self.free.qsize() < self.buffers:
+            self.free.put(frame)
+
+
+def bench_color_correction(iterations=200):
+    """Per-frame cost of the old float32 correction vs. the LUT/preallocated-buffer path"""
+    height, width = CAMERA_RESOLUTION[1], CAMERA_RESOLUTION[0]
+    frame_bgra = np.random.randint(0, 256, (height, width, 4), dtype=np.uint8)
+    blue_gain, _, red_gain = COLOR_GAINS
+
+    def legacy(frame_bgra):
+        frame = cv2.cvtColor(frame_bgra, cv2.COLOR_BGRA2BGR)
+        frame = frame.astype(np.float32)
+        frame[:, :, 0] = np.clip(frame[:, :, 0] * blue_gain, 0, 255)
+        frame[:, :, 2] = np.clip(frame[:, :, 2] * red_gain, 0, 255)
+        return frame.astype(np.uint8)
+
+    corrector = ColorCorrector(enabled=True)
+
+    def lut(frame_bgra):
+        frame = corrector.apply(frame_bgra)
+        corrector.release(frame)
+        return frame
+
+    expected = legacy(frame_bgra)
+    if not np.array_equal(expected, lut(frame_bgra)):
+        print("⚠ LUT output differs from the float32 correction")
+
+    print(f"Color correction on {width}x{height}, {iterations} frames:")
+    for name, fn in (("float32 + clip", legacy), ("LUT, preallocated", lut)):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn(frame_bgra)
+        elapsed = time.perf_counter() - started
+        print(f"  {name:<18} {1000 * elapsed / iterations:.2f} ms/frame")
+
+# =============================================================================
+# HEADLESS SCHEDULING
+# =============================================================================
+
+def parse_capture_window(spec):
+    """Parse "HH:MM-HH:MM[,HH:MM-HH:MM...]" into (start, end) minute-of-day pairs"""
+    def to_minutes(hhmm):
+        hours, minutes = hhmm.strip().split(":")
+        return int(hours) * 60 + int(minutes)
+
+    windows = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        start, end = part.split("-")
+        windows.append((to_minutes(start), to_minutes(end)))
+    return windows
+
+
+def in_capture_window(windows, now=None):
+    """True when now (local time) falls in one of the windows; windows may wrap past midnight"""
+    if not windows:
+        return True
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    for start, end in windows:
+        if start <= end and start <= minute < end:
+            return True
+        if start > end and (minute >= start or minute < end):
+            return True
+    return False
+
+
+class MotionGate:
+    """
+    Decides whether a frame needs full inference, using a running-average background model of the
+    greyscale ROI. Sticky traps change slowly, so most frames can reuse the last result. The comparison
+    runs at close to capture resolution and triggers on a handful of changed pixels, so a single newly
+    landed whitefly (a few pixels across) still counts as a change.
+    """
+
+    def __init__(self, min_pixels=MOTION_MIN_PIXELS, pixel_delta=MOTION_PIXEL_DELTA, max_interval=MOTION_MAX_INTERVAL,
+                 learning_rate=MOTION_LEARNING_RATE, scale=MOTION_SCALE, roi=ROI):
+        self.min_pixels = min_pixels
+        self.pixel_delta = pixel_delta
+        self.max_interval = max_interval
+        self.learning_rate = learning_rate
+        self.scale = max(1, int(scale))
+        self.roi = roi
+        self.size = None        # (width, height) compared; buffers are allocated for the first frame
+        self.background = None  # float32 running average
+        self.last_run = None
+        self.last_changed = 0
+        self.analysed = 0
+        self.skipped = 0
+
+    def _allocate(self, width, height):
+        self.size = (max(1, width // self.scale), max(1, height // self.scale))
+        shape = (self.size[1], self.size[0])
+        self.small = np.empty(shape + (3,), dtype=np.uint8)
+        self.gray = np.empty(shape, dtype=np.uint8)
+        self.background_u8 = np.empty(shape, dtype=np.uint8)
+        self.diff = np.empty(shape, dtype=np.uint8)
+        self.background = None
+
+    def should_run(self, frame):
+        """Update the background with this frame; True when it needs full inference"""
+        x0, y0, x1, y1 = roi_box(frame.shape, self.roi)
+        region = frame[y0:y1, x0:x1]
+        if self.size is None:
+            self._allocate(x1 - x0, y1 - y0)
+        if self.scale == 1:
+            np.copyto(self.small, region)
+        else:
+            cv2.resize(region, self.size, dst=self.small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        if self.background is None:
+            self.background = self.gray.astype(np.float32)
+            changed = self.diff.size
+        else:
+            cv2.convertScaleAbs(self.background, dst=self.background_u8)
+            cv2.absdiff(self.gray, self.background_u8, dst=self.diff)
+            changed = int(np.count_nonzero(self.diff > self.pixel_delta))
+            cv2.accumulateWeighted(self.gray, self.background, self.learning_rate)
+        self.last_changed = changed
+
+        now = time.monotonic()
+        if changed >= self.min_pixels or self.last_run is None or now - self.last_run >= self.max_interval:
+            self.last_run = now
+            self.analysed += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def skip_ratio(self):
+        total = self.analysed + self.skipped
+        return self.skipped / total if total else 0.0
+
+    def summary(self):
+        return (f"motion gate: {self.analysed} analysed, {self.skipped} skipped "
+                f"({100 * self.skip_ratio():.0f}% of inferences skipped)")
+
 # =============================================================================
 # CLASS: InsectDetector
 # =============================================================================
 
 class InsectDetector:
-    def __init__(self):
+    def __init__(self, headless=False, tiled=TILED_INFERENCE):
         """Initialize the insect detector with camera and model"""
+        self.headless = headless
+        self.tiled = tiled
+        resolution = TILED_CAPTURE_RESOLUTION if tiled else CAMERA_RESOLUTION
         print("=" * 60)
         print("JP Global InsectDetect - Raspberry Pi Detection System")
         print("=" * 60)
@@ -70,18 +789,20 @@ class InsectDetector:
             self.labels = self.model.names
             print(f"✓ Model loaded successfully")
             print(f"✓ Detected classes: {self.labels}")
+            self.class_names = self._class_names()
         except Exception as e:
             print(f"✗ Error loading model: {e}")
             sys.exit(1)
 
         # Initialize camera (Picamera2) using XRGB8888 for best OpenCV compatibility
-        print(f"\n[2/3] Initializing Picamera2 at {CAMERA_RESOLUTION[0]}x{CAMERA_RESOLUTION[1]}")
+        print(f"\n[2/3] Initializing Picamera2 at {resolution[0]}x{resolution[1]}"
+              f"{f' ({TILE_SIZE}px tiles)' if tiled else ''}")
         try:
             self.camera = Picamera2()
 
             # Use XRGB8888 config to capture BGRA arrays suitable for OpenCV conversion
             camera_config = self.camera.create_video_configuration(
-                main={"format": "XRGB8888", "size": CAMERA_RESOLUTION}
+                main={"format": "XRGB8888", "size": resolution}
             )
             self.camera.configure(camera_config)
 
@@ -113,6 +834,31 @@ class InsectDetector:
         else:
             print("⚠ Warning: Could not verify API connection (continuing; uploads may fail)")
 
+        # Offline spool + background sender: uploads never block the capture loop
+        self.spool = OfflineSpool()
+        self.sender = UploadSender(self.spool)
+        self.sender.start()
+        pending = self.spool.count()
+        if pending:
+            print(f"✓ Resuming upload of {pending} spooled capture(s)")
+
+        # Capture -> inference -> preview/upload pipeline (threads are started by run())
+        self.color = ColorCorrector()
+        self.gate = MotionGate() if MOTION_GATE else None
+        self.last_result = None  # reused for frames the motion gate lets through without inference
+        self.force_inference = threading.Event()  # set by a capture that needs a freshly inferred frame
+        self.tracker = InsectTracker()
+        self.reported_population = None  # population sent with the last upload
+        self.frames = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        self.results = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        self.stats = PipelineStats()
+        self.stop_event = threading.Event()
+        self.workers = []
+
+        # Recently previewed frames with their detections; capture/save act on these
+        self.history = deque(maxlen=RESULT_HISTORY)
+        self.selected_id = None  # frame_id picked with [,]/[.]; None follows the live preview
+
         # Set bounding box colors (kept simple)
         self.bbox_colors = [
             (164, 120, 87),   # neutral
@@ -125,10 +871,13 @@ class InsectDetector:
         print("\n" + "=" * 60)
         print("System Ready!")
         print("=" * 60)
+        if headless:
+            return
         print("\nControls:")
         print("  [SPACEBAR] - Capture & Upload")
         print("  [Q]        - Quit")
         print("  [S]        - Save image locally (no upload)")
+        print(f"  [,] / [.]  - Step back / forward through the last {RESULT_HISTORY} frames")
         print("\n" + "=" * 60 + "\n")
 
     def _test_connection(self):
@@ -144,162 +893,299 @@ class InsectDetector:
             return False
 
     def capture_frame(self):
-        """Capture a frame from the camera and return BGR numpy array for OpenCV processing"""
+        """Capture a frame from the camera and return a BGR numpy array (a pooled buffer, see ColorCorrector)"""
         # Picamera2 configured with XRGB8888 -> capture_array returns BGRA-like array
         frame_bgra = self.camera.capture_array()
-        # Convert BGRA -> BGR for OpenCV
-        frame = cv2.cvtColor(frame_bgra, cv2.COLOR_BGRA2BGR)
+        # BGRA -> BGR plus the COLOR_GAINS lookup table, in place in a reused buffer
+        return self.color.apply(frame_bgra)
 
-        # Apply minor software color correction if desired
-        if USE_COLOR_CORRECTION:
-            # subtle adjustments, avoid harsh scaling
-            # reduce blue slightly, increase red slightly to reduce blue tint
-            frame = frame.astype(np.float32)
-            frame[:, :, 0] = np.clip(frame[:, :, 0] * 0.95, 0, 255)  # Blue channel
-            frame[:, :, 2] = np.clip(frame[:, :, 2] * 1.05, 0, 255)  # Red channel
-            frame = frame.astype(np.uint8)
+    def _class_names(self):
+        """Insect name for every model class index (INSECT_MAPPING overrides the model's labels)"""
+        labels = self.labels if isinstance(self.labels, dict) else dict(enumerate(self.labels))
+        count = max(list(labels) + list(INSECT_MAPPING), default=-1) + 1
+        return [INSECT_MAPPING.get(i, labels.get(i, str(i))).lower() for i in range(count)]
 
-        return frame
+    def detect_insects(self, frame, draw=True):
+        """
+        Run YOLO detection on the frame.
+        Returns (detections, insect counts, annotated frame); the annotated frame is None when draw=False.
+        """
+        roi = roi_box(frame.shape)
+        if self.tiled:
+            xyxy, class_ids, confidences = self._predict_tiled(frame, roi)
+        else:
+            xyxy, class_ids, confidences = self._predict(frame)
+
+        keep = confidences >= CONFIDENCE_THRESHOLD
+        if ROI is not None:
+            centre_x = (xyxy[:, 0] + xyxy[:, 2]) / 2
+            centre_y = (xyxy[:, 1] + xyxy[:, 3]) / 2
+            keep &= (centre_x >= roi[0]) & (centre_x < roi[2]) & (centre_y >= roi[1]) & (centre_y < roi[3])
+        xyxy, class_ids, confidences = xyxy[keep], class_ids[keep], confidences[keep]
+
+        if self.tiled and len(confidences):
+            # Per-class NMS across tile seams: shift each class into its own coordinate range
+            offsets = class_ids[:, None] * (float(max(frame.shape)) + 1)
+            kept = nms(xyxy + offsets, confidences)
+            xyxy, class_ids, confidences = xyxy[kept], class_ids[kept], confidences[kept]
+        xyxy = xyxy.astype(int)
+
+        names = self.class_names
+        detected_insects = [
+            {'insect': names[class_idx], 'class_id': class_idx, 'confidence': confidence, 'bbox': tuple(box)}
+            for box, class_idx, confidence in zip(xyxy.tolist(), class_ids.tolist(), confidences.tolist())
+        ]
 
-    def detect_insects(self, frame):
-        """Run YOLO detection on the frame and return detections + annotated frame"""
+        insect_counts = {}
+        per_class = np.bincount(class_ids, minlength=len(names))
+        for class_idx in np.flatnonzero(per_class):
+            name = names[class_idx]
+            insect_counts[name] = insect_counts.get(name, 0) + int(per_class[class_idx])
+
+        annotated_frame = self.draw_detections(frame, detected_insects) if draw else None
+        return detected_insects, insect_counts, annotated_frame
+
+    @staticmethod
+    def _boxes(result, offset=(0, 0)):
+        """(xyxy, class ids, confidences) of one result - one device->host transfer per attribute"""
+        boxes = result.boxes
+        xyxy = boxes.xyxy.cpu().numpy().reshape(-1, 4) + np.array(offset * 2, dtype=np.float32)
+        return xyxy, boxes.cls.cpu().numpy().astype(np.intp), boxes.conf.cpu().numpy()
+
+    def _predict(self, frame):
         results = self.model(frame, verbose=False)
-        detections = results[0].boxes
+        return self._boxes(results[0])
 
-        detected_insects = []
-        annotated_frame = frame.copy()
+    def _predict_tiled(self, frame, roi):
+        """Run overlapping TILE_SIZE tiles that touch the ROI through the model as one batch"""
+        height, width = frame.shape[:2]
+        tile_w, tile_h = min(TILE_SIZE, width), min(TILE_SIZE, height)
+        origins = [
+            (x, y)
+            for y in tile_origins(height, tile_h, TILE_OVERLAP)
+            for x in tile_origins(width, tile_w, TILE_OVERLAP)
+            if x < roi[2] and x + tile_w > roi[0] and y < roi[3] and y + tile_h > roi[1]
+        ]
+        if not origins:
+            return np.empty((0, 4), np.float32), np.empty(0, np.intp), np.empty(0, np.float32)
+        tiles = [frame[y:y + tile_h, x:x + tile_w] for x, y in origins]
+        results = self.model(tiles, verbose=False)
 
-        for i in range(len(detections)):
-            # Extract bbox coordinates
-            xyxy_tensor = detections[i].xyxy.cpu()
-            xyxy = xyxy_tensor.numpy().squeeze()
-            xmin, ymin, xmax, ymax = xyxy.astype(int)
-
-            # Class and confidence
-            class_idx = int(detections[i].cls.item())
-            confidence = float(detections[i].conf.item())
-            class_name = self.labels.get(class_idx, str(class_idx)) if isinstance(self.labels, dict) else (self.labels[class_idx] if class_idx < len(self.labels) else str(class_idx))
-
-            if confidence >= CONFIDENCE_THRESHOLD:
-                insect_name = INSECT_MAPPING.get(class_idx, class_name).lower()
-                detected_insects.append({
-                    'insect': insect_name,
-                    'confidence': confidence,
-                    'bbox': (xmin, ymin, xmax, ymax)
-                })
+        parts, margin = [], 2
+        for (x, y), result in zip(origins, results):
+            xyxy, class_ids, confidences = self._boxes(result, offset=(x, y))
+            # Boxes cut by an inner tile edge are partial; the neighbouring tile sees them whole
+            cut = np.zeros(len(xyxy), dtype=bool)
+            if x > 0:
+                cut |= xyxy[:, 0] <= x + margin
+            if y > 0:
+                cut |= xyxy[:, 1] <= y + margin
+            if x + tile_w < width:
+                cut |= xyxy[:, 2] >= x + tile_w - margin
+            if y + tile_h < height:
+                cut |= xyxy[:, 3] >= y + tile_h - margin
+            parts.append((xyxy[~cut], class_ids[~cut], confidences[~cut]))
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+    def draw_detections(self, frame, detections):
+        """Return a copy of the frame with boxes and labels drawn (skipped entirely on headless units)"""
+        annotated_frame = frame.copy()
+        if ROI is not None:
+            x0, y0, x1, y1 = roi_box(frame.shape)
+            cv2.rectangle(annotated_frame, (x0, y0), (x1, y1), (255, 255, 255), 1)
+        for det in detections:
+            xmin, ymin, xmax, ymax = det['bbox']
+            color = self.bbox_colors[det['class_id'] % len(self.bbox_colors)]
+            cv2.rectangle(annotated_frame, (xmin, ymin), (xmax, ymax), color, 2)
+            label = f"{det['insect']}: {int(det['confidence'] * 100)}%"
+            label_size, baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+            label_ymin = max(ymin, label_size[1] + 10)
+            cv2.rectangle(annotated_frame,
+                          (xmin, label_ymin - label_size[1] - 10),
+                          (xmin + label_size[0], label_ymin + baseline - 10),
+                          color, cv2.FILLED)
+            cv2.putText(annotated_frame, label, (xmin, label_ymin - 7), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+        return annotated_frame
 
-                color = self.bbox_colors[class_idx % len(self.bbox_colors)]
-                cv2.rectangle(annotated_frame, (xmin, ymin), (xmax, ymax), color, 2)
-                label = f"{insect_name}: {int(confidence * 100)}%"
-                label_size, baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-                label_ymin = max(ymin, label_size[1] + 10)
-                cv2.rectangle(annotated_frame,
-                              (xmin, label_ymin - label_size[1] - 10),
-                              (xmin + label_size[0], label_ymin + baseline - 10),
-                              color, cv2.FILLED)
-                cv2.putText(annotated_frame, label, (xmin, label_ymin - 7), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
-
-        return detected_insects, annotated_frame
-
-    def upload_to_supabase(self, image, detections):
-        """Upload detection results to Flask API (Supabase stored server-side)"""
-        if len(detections) == 0:
+    def upload_to_supabase(self, image, insect_counts, population=None):
+        """
+        Queue detection results for upload; the UploadSender thread delivers them to the Flask API.
+        insect_counts are new arrivals, population the insects currently on the trap (if tracked).
+        """
+        if not insect_counts and population is None:
             print("⚠ No insects detected - skipping upload")
             return False
 
-        print(f"\n📤 Uploading detection results...")
-        # Count insects by type
-        insect_counts = {}
-        for det in detections:
-            insect_counts[det['insect']] = insect_counts.get(det['insect'], 0) + 1
-
+        print(f"\n📤 Queueing detection results for upload...")
         for insect, cnt in insect_counts.items():
-            print(f"   - {insect}: {cnt}")
-
-        primary_insect = max(insect_counts, key=insect_counts.get)
-        total_count = sum(insect_counts.values())
+            print(f"   - {insect}: {cnt} new")
+        if population is not None:
+            print(f"   on trap: {sum(population.values())}")
 
-        # Encode image to base64 (same format as your working example)
         success, buffer = cv2.imencode('.jpg', image)
         if not success:
             print("✗ Failed to encode image")
             return False
-        image_base64 = base64.b64encode(buffer).decode('utf-8')
-
-        payload = {
-            "insect": primary_insect,
-            "count": total_count,
-            "image_base64": image_base64
-        }
-
-        headers = {"Content-Type": "application/json"}
-        if USE_DEVICE_KEY and DEVICE_KEY:
-            headers["Device-Key"] = DEVICE_KEY
-            print("   Using device key authentication")
-        else:
-            # Include farmer_id as fallback if device key not used
-            payload["farmer_id"] = FARMER_ID
-            print(f"   Using farmer_id in payload: {FARMER_ID}")
-            print("   ⚠️  Note: For production, get a device key from admin panel")
-
-        try:
-            response = requests.post(API_ENDPOINT, json=payload, headers=headers, timeout=30)
-
-            if response.status_code == 200:
-                result = response.json()
-                print("✓ Upload successful!")
-                print(f"   Status: {result.get('status')}")
-                if 'image_url' in result:
-                    print(f"   Image URL: {result['image_url'][:80]}...")
-                return True
-            else:
-                print(f"✗ Upload failed: {response.status_code}")
-                print(f"   Error: {response.text}")
-                return False
 
-        except requests.exceptions.Timeout:
-            print("✗ Upload timeout - check your internet connection")
-            return False
-        except Exception as e:
-            print(f"✗ Upload error: {e}")
-            return False
+        self.spool.enqueue(buffer.tobytes(), insect_counts, population=population)
+        self.reported_population = population
+        print(f"✓ Queued ({self.spool.count()} capture(s) waiting for upload)")
+        return True
 
     def save_locally(self, image, detections, prefix="capture"):
         """Save image locally with timestamp"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{prefix}_{timestamp}.jpg"
+        os.makedirs(LOCAL_SAVE_DIR, exist_ok=True)
+        filename = os.path.join(LOCAL_SAVE_DIR, f"{prefix}_{timestamp}.jpg")
         cv2.imwrite(filename, image)
         print(f"💾 Saved locally: {filename}")
         return filename
 
+    def camera_loop(self):
+        """Pipeline stage 1: capture frames as fast as the camera delivers them"""
+        frame_id = 0
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            try:
+                frame = self.capture_frame()
+            except Exception as e:
+                print(f"✗ Capture error: {e}")
+                self.stop_event.wait(1)
+                continue
+            self.stats.record("capture", time.monotonic() - started)
+            frame_id += 1
+            put_latest(self.frames, (frame_id, started, frame), self.stats, "capture",
+                       on_drop=lambda item: self.color.release(item[2]))
+
+    def inference_loop(self):
+        """Pipeline stage 2: run the model on the newest captured frame"""
+        while not self.stop_event.is_set():
+            try:
+                frame_id, captured_at, frame = self.frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            started = time.monotonic()
+            try:
+                changed = self.gate is None or self.gate.should_run(frame)
+                if changed or self.force_inference.is_set() or self.last_result is None:
+                    self.force_inference.clear()
+                    detections, counts, annotated_frame = self.detect_insects(frame)
+                    stage = "inference"
+                else:
+                    # Scene unchanged: redraw the cached detections on the live frame
+                    detections, counts = self.last_result.detections, self.last_result.counts
+                    annotated_frame = self.draw_detections(frame, detections)
+                    stage = "reused"
+            except Exception as e:
+                print(f"✗ Inference error: {e}")
+                continue
+            finally:
+                self.color.release(frame)
+            self.stats.record(stage, time.monotonic() - started)
+            result = FrameResult(frame_id, captured_at, detections, counts, annotated_frame, stage == "inference")
+            if stage == "inference":
+                self.last_result = result
+                self.tracker.update(detections)
+            put_latest(self.results, result, self.stats, "inference")
+
+    def start_pipeline(self):
+        for target, name in ((self.camera_loop, "camera"), (self.inference_loop, "inference")):
+            worker = threading.Thread(target=target, name=name, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def selected_result(self):
+        """The frame SPACE/S act on: the selected one from the history, else the newest"""
+        if self.selected_id is not None:
+            for result in self.history:
+                if result.frame_id == self.selected_id:
+                    return result
+            self.selected_id = None  # aged out of the history
+        return self.history[-1] if self.history else None
+
+    def select_result(self, step):
+        """Move the selection `step` frames back (negative) or forward; past the newest returns to live"""
+        if not self.history:
+            return
+        ids = [result.frame_id for result in self.history]
+        current = self.selected_result().frame_id
+        index = ids.index(current) + step
+        if index >= len(ids) - 1:
+            self.selected_id = None
+        else:
+            self.selected_id = ids[max(index, 0)]
+
+    def fresh_result(self, shown, timeout=10):
+        """
+        The result a capture should use: `shown` when the model ran on that frame, otherwise the next frame
+        inferred on demand - reused detections may be minutes old and don't belong to the shown frame.
+        """
+        if shown.inferred:
+            return shown
+        print("↻ Preview is showing reused detections - running inference on a new frame")
+        self.force_inference.set()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                result = self.results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.history.append(result)
+            if result.inferred:
+                return result
+        print("✗ No freshly inferred frame - capture cancelled")
+        return None
+
     def run(self):
-        """Main detection loop with live preview"""
+        """Main loop: preview and key handling (OpenCV windows must stay on the main thread)"""
+        self.start_pipeline()
         try:
             while True:
-                frame = self.capture_frame()
-                detections, annotated_frame = self.detect_insects(frame)
+                try:
+                    result = self.results.get(timeout=0.5)
+                except queue.Empty:
+                    result = None
 
-                status_text = f"Detections: {len(detections)} | Press [SPACE] to capture"
-                cv2.putText(annotated_frame, status_text, (10, 30),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+                started = time.monotonic()
+                if result is not None:
+                    self.history.append(result)
+                shown = self.selected_result()
+                if shown is None:
+                    cv2.waitKey(1)
+                    continue
 
-                if CAMERA_PREVIEW:
-                    cv2.imshow('InsectDetect - Live Preview', annotated_frame)
+                if CAMERA_PREVIEW and (result is not None or self.selected_id is not None):
+                    # Draw the status line on a copy so captures are uploaded without it
+                    preview = shown.annotated.copy()
+                    status_text = f"Detections: {len(shown.detections)} | Press [SPACE] to capture"
+                    if self.selected_id is not None:
+                        age = self.history[-1].captured_at - shown.captured_at
+                        status_text = f"[{age:.1f}s ago] " + status_text
+                    cv2.putText(preview, status_text, (10, 30),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+                    cv2.imshow('InsectDetect - Live Preview', preview)
 
                 key = cv2.waitKey(1) & 0xFF
+                if result is not None:
+                    now = time.monotonic()
+                    self.stats.record("display", now - started)
+                    self.stats.record("end-to-end", now - result.captured_at)
+                if self.stats.maybe_report() and self.gate:
+                    print("📊 " + self.gate.summary())
 
                 if key == ord(' '):  # Spacebar - Capture and upload
                     print("\n" + "="*60)
                     print("📸 CAPTURE TRIGGERED")
                     print("="*60)
 
-                    capture_frame = self.capture_frame()
-                    detections, annotated_capture = self.detect_insects(capture_frame)
-
-                    if len(detections) > 0:
-                        saved_file = self.save_locally(annotated_capture, detections, prefix="detection")
-                        self.upload_to_supabase(annotated_capture, detections)
-                    else:
+                    # Upload what the operator was looking at - re-inferred only if its detections were reused
+                    capture = self.fresh_result(shown)
+                    self.selected_id = None
+                    if capture is not None and len(capture.detections) > 0:
+                        # The spool keeps the image on disk until it has been uploaded
+                        arrivals, population = self.tracker.report()
+                        self.upload_to_supabase(capture.annotated, arrivals, population)
+                    elif capture is not None:
                         print("⚠ No insects detected in capture")
                         # On headless device you may want default behaviour - here we ask interactively
                         try:
@@ -307,14 +1193,21 @@ class InsectDetector:
                         except Exception:
                             save_anyway = 'n'
                         if save_anyway.lower() == 'y':
-                            self.save_locally(annotated_capture, detections, prefix="no_detection")
+                            self.save_locally(capture.annotated, capture.detections, prefix="no_detection")
 
                     print("="*60 + "\n")
 
                 elif key == ord('s') or key == ord('S'):  # Save locally only
-                    capture_frame = self.capture_frame()
-                    detections, annotated_capture = self.detect_insects(capture_frame)
-                    self.save_locally(annotated_capture, detections, prefix="manual_save")
+                    capture = self.fresh_result(shown)
+                    if capture is not None:
+                        self.save_locally(capture.annotated, capture.detections, prefix="manual_save")
+                    self.selected_id = None
+
+                elif key == ord(','):  # Older frame
+                    self.select_result(-1)
+
+                elif key == ord('.'):  # Newer frame (past the newest returns to live)
+                    self.select_result(1)
 
                 elif key == ord('q') or key == ord('Q'):  # Quit
                     print("\n👋 Shutting down...")
@@ -326,14 +1219,76 @@ class InsectDetector:
         finally:
             self.cleanup()
 
+    def run_headless(self, interval=CAPTURE_INTERVAL, window=CAPTURE_WINDOW, motion_gate=MOTION_GATE):
+        """Service loop: scheduled captures, no preview window and no prompts (stops on SIGTERM/SIGINT)"""
+        windows = parse_capture_window(window)
+        if not motion_gate:
+            self.gate = None
+        gate = self.gate
+        # A single missed capture must not expire a track, however long the interval
+        self.tracker.max_unseen = max(self.tracker.max_unseen, 3 * interval)
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop_event.set())
+        print(f"\nHeadless mode: capture every {interval:g}s"
+              f"{' during ' + window if window else ''}{', motion gate on' if gate else ''}\n")
+        try:
+            while not self.stop_event.is_set():
+                started = time.monotonic()
+                if not in_capture_window(windows):
+                    self.stop_event.wait(min(interval, 60))
+                    continue
+
+                # Like the live pipeline's loops, a camera or model error skips this capture instead of
+                # ending the service; only SIGTERM / Ctrl-C stop it
+                try:
+                    frame = self.capture_frame()
+                except Exception as e:
+                    print(f"✗ Capture error: {e}")
+                    self.stop_event.wait(min(interval, 5))
+                    continue
+                try:
+                    # An unchanged trap keeps its last result: nothing new to upload
+                    if gate is None or gate.should_run(frame):
+                        detections, counts, annotated = self.detect_insects(frame, draw=HEADLESS_DRAW)
+                        self.stats.record("inference", time.monotonic() - started)
+                        self.tracker.update(detections)
+                        arrivals, population = self.tracker.report()
+                        if arrivals or population != (self.reported_population or {}):
+                            # Encoded to JPEG before the frame buffer goes back to the pool
+                            self.upload_to_supabase(annotated if annotated is not None else frame,
+                                                    arrivals, population)
+                        else:
+                            print(f"{datetime.now():%H:%M:%S} no new insects "
+                                  f"({sum(population.values())} on trap)")
+                except Exception as e:
+                    print(f"✗ Inference error: {e}")
+                    self.stop_event.wait(min(interval, 5))
+                    continue
+                finally:
+                    self.color.release(frame)
+
+                if self.stats.maybe_report() and gate:
+                    print("📊 " + gate.summary())
+                self.stop_event.wait(max(0.0, interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            print("\n\n⚠ Interrupted by user")
+        finally:
+            self.cleanup()
+
     def cleanup(self):
         """Clean up resources"""
         print("🧹 Cleaning up resources...")
+        self.stop_event.set()
+        for worker in self.workers:
+            worker.join(timeout=5)
         try:
             self.camera.stop()
         except Exception:
             pass
-        cv2.destroyAllWindows()
+        # Anything not yet uploaded stays in the spool and is sent on the next start
+        self.sender.stop()
+        self.sender.join(timeout=5)
+        if not self.headless:
+            cv2.destroyAllWindows()
         print("✓ Cleanup complete")
         print("\nThank you for using JP Global InsectDetect!")
 
@@ -342,14 +1297,40 @@ class InsectDetector:
 # =============================================================================
 
 def main():
+    parser = argparse.ArgumentParser(description="JP Global InsectDetect - Raspberry Pi detection")
+    parser.add_argument("--bench-color", action="store_true",
+                        help="benchmark the color correction path and exit (no camera or model needed)")
+    parser.add_argument("--tiled", action="store_true", default=TILED_INFERENCE,
+                        help=f"capture at {TILED_CAPTURE_RESOLUTION[0]}x{TILED_CAPTURE_RESOLUTION[1]} "
+                             f"and run the model on overlapping {TILE_SIZE}px tiles")
+    parser.add_argument("--headless", action="store_true",
+                        help="run as a service: scheduled captures, no preview window or keyboard")
+    parser.add_argument("--interval", type=float, default=CAPTURE_INTERVAL,
+                        help=f"seconds between headless captures (default {CAPTURE_INTERVAL})")
+    parser.add_argument("--window", default=CAPTURE_WINDOW,
+                        help='headless capture windows in local time, e.g. "06:00-20:00"')
+    parser.add_argument("--no-motion-gate", action="store_true",
+                        help="run the model on every scheduled capture")
+    args = parser.parse_args()
+    try:
+        parse_capture_window(args.window)
+    except ValueError:
+        parser.error(f"invalid --window {args.window!r}, expected HH:MM-HH:MM[,HH:MM-HH:MM]")
+    if args.bench_color:
+        bench_color_correction()
+        return
+
     # If you want to test via farmer_id instead of device key, set USE_DEVICE_KEY = False above.
     if USE_DEVICE_KEY and (not DEVICE_KEY or DEVICE_KEY == "YOUR_DEVICE_KEY_HERE"):
         print("⚠️  WARNING: DEVICE_KEY not configured correctly.")
         print("   Changing to farmer_id fallback for this run.")
         time.sleep(2)
 
-    detector = InsectDetector()
-    detector.run()
+    detector = InsectDetector(headless=args.headless, tiled=args.tiled)
+    if args.headless:
+        detector.run_headless(args.interval, args.window, motion_gate=MOTION_GATE and not args.no_motion_gate)
+    else:
+        detector.run()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,158 @@
+// Sidebar toggle for mobile - DEBUGGED VERSION
+function toggleSidebar() {
+    console.log('toggleSidebar called'); // Debug log
+    
+    const sidebar = document.querySelector('.sidebar');
+    const overlay = document.querySelector('.sidebar-overlay');
+    
+    console.log('Sidebar found:', sidebar); // Debug log
+    console.log('Overlay found:', overlay); // Debug log
+    
+    if (sidebar) {
+        sidebar.classList.toggle('open');
+        console.log('Sidebar classes:', sidebar.className); // Debug log
+    }
+    
+    if (overlay) {
+        overlay.classList.toggle('active');
+        console.log('Overlay classes:', overlay.className); // Debug log
+    }
+}
+
+// Close sidebar when clicking overlay
+function closeSidebar() {
+    console.log('closeSidebar called'); // Debug log
+    
+    const sidebar = document.querySelector('.sidebar');
+    const overlay = document.querySelector('.sidebar-overlay');
+    
+    if (sidebar) {
+        sidebar.classList.remove('open');
+    }
+    
+    if (overlay) {
+        overlay.classList.remove('active');
+    }
+}
+
+// Close sidebar when clicking any menu item (mobile only)
+document.addEventListener('DOMContentLoaded', function() {
+    console.log('DOM loaded'); // Debug log
+    
+    const menuItems = document.querySelectorAll('.menu-item');
+    const isMobile = window.innerWidth <= 768;
+    
+    console.log('Menu items found:', menuItems.length); // Debug log
+    console.log('Is mobile:', isMobile); // Debug log
+    
+    if (isMobile) {
+        menuItems.forEach(item => {
+            item.addEventListener('click', function() {
+                setTimeout(closeSidebar, 150);
+            });
+        });
+    }
+});
+
+// Image modal functions
+function openModal(imageSrc) {
+    const modal = document.getElementById('imageModal');
+    const modalImage = document.getElementById('modalImage');
+    
+    if (modal && modalImage) {
+        modal.style.display = 'block';
+        modalImage.src = imageSrc;
+        document.body.style.overflow = 'hidden';
+    }
+}
+
+function closeModal() {
+    const modal = document.getElementById('imageModal');
+    if (modal) {
+        modal.style.display = 'none';
+        document.body.style.overflow = 'auto';
+    }
+}
+
+window.onclick = function(event) {
+    const modal = document.getElementById('imageModal');
+    if (event.target == modal) {
+        closeModal();
+    }
+}
+
+// Close modal on escape key
+document.addEventListener('keydown', function(event) {
+    if (event.key === 'Escape') {
+        closeModal();
+    }
+});
+
+// Clipboard copy helper (device keys)
+function copyDeviceKey(el) {
+    const key = el.getAttribute('data-key');
+    if (!key) return;
+    
+    navigator.clipboard.writeText(key).then(() => {
+        const toast = document.createElement('div');
+        toast.innerText = '✓ Device key copied!';
+        toast.style.cssText = `
+            position: fixed;
+            z-index: 9999;
+            right: 20px;
+            bottom: 20px;
+            padding: 12px 20px;
+            background: rgba(76, 217, 100, 0.9);
+            color: #fff;
+            border-radius: 10px;
+            font-size: 14px;
+            font-weight: 500;
+            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.3);
+            animation: slideInUp 0.3s ease;
+        `;
+        
+        document.body.appendChild(toast);
+        
+        setTimeout(() => {
+            toast.style.animation = 'slideOutDown 0.3s ease';
+            setTimeout(() => toast.remove(), 300);
+        }, 2000);
+    }).catch(err => {
+        alert('Failed to copy: ' + err);
+    });
+}
+
+// Add toast animations
+const style = document.createElement('style');
+style.textContent = `
+    @keyframes slideInUp {
+        from {
+            transform: translateY(100%);
+            opacity: 0;
+        }
+        to {
+            transform: translateY(0);
+            opacity: 1;
+        }
+    }
+    
+    @keyframes slideOutDown {
+        from {
+            transform: translateY(0);
+            opacity: 1;
+        }
+        to {
+            transform: translateY(100%);
+            opacity: 0;
+        }
+    }
+`;
+document.head.appendChild(style);
+
+// Precache the shared CSS / JS for the next visits
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', function() {
+        navigator.serviceWorker.register('/service-worker.js')
+            .catch(err => console.log('Service worker registration failed:', err));
+    });
+}
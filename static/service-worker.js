@@ -1,10 +1,9 @@
-const CACHE_NAME = 'jp-insectdetect-v1';
-const urlsToCache = [
-  '/',
-  '/login',
+// Served by app.py at /service-worker.js, which fills in the current content-hashed asset URLs
+const CACHE_NAME = 'jp-insectdetect-__ASSET_VERSION__';
+const urlsToCache = __ASSET_URLS__.concat([
   '/static/images/logo.png',
   '/static/manifest.json'
-];
+]);
 
 self.addEventListener('install', event => {
   event.waitUntil(
@@ -21,25 +20,39 @@ self.addEventListener('install', event => {
 });
 
 self.addEventListener('fetch', event => {
-  event.respondWith(
-    caches.match(event.request)
-      .then(response => {
-        if (response) {
-          return response;
-        }
-        return fetch(event.request)
-          .then(response => {
-            if (!response || response.status !== 200 || response.type !== 'basic') {
-              return response;
-            }
-            const responseToCache = response.clone();
-            caches.open(CACHE_NAME)
-              .then(cache => {
-                cache.put(event.request, responseToCache);
-              });
+  const url = new URL(event.request.url);
+  if (event.request.method !== 'GET' || url.origin !== self.location.origin) {
+    return;
+  }
+
+  // Fingerprinted assets and images never change under the same URL: serve them from the cache
+  if (url.pathname.startsWith('/assets/') || url.pathname.startsWith('/static/')) {
+    event.respondWith(
+      caches.match(event.request)
+        .then(response => {
+          if (response) {
             return response;
-          });
-      })
+          }
+          return fetch(event.request)
+            .then(response => {
+              if (!response || response.status !== 200 || response.type !== 'basic') {
+                return response;
+              }
+              const responseToCache = response.clone();
+              caches.open(CACHE_NAME)
+                .then(cache => {
+                  cache.put(event.request, responseToCache);
+                });
+              return response;
+            });
+        })
+    );
+    return;
+  }
+
+  // Pages and API data are always fetched fresh
+  event.respondWith(
+    fetch(event.request)
       .catch(() => {
         return new Response('Offline - JP Global InsectDetect', {
           headers: { 'Content-Type': 'text/html' }
@@ -0,0 +1,107 @@
+# test_aggregation.py - Unit tests for the dashboard aggregation hot path (run: python -m pytest)
+from aggregation import (records_frame, record_summaries, daily_insect_series, daily_totals, insect_totals,
+                         top_insect, to_rollup_rows)
+
+RECORDS = [
+    {"timestamp": "2025-10-01T08:00:00+00:00", "farmer_id": "farmer_001", "device_id": 1,
+     "detections": {"whiteflies": 5, "aphids": 2}},
+    {"timestamp": "2025-10-01T23:30:00-02:00", "farmer_id": "farmer_001", "device_id": 1,
+     "detections": '{"aphids": "3", "thrips": 1.0}'},
+    {"timestamp": "2025-10-03T12:00:00Z", "farmer_id": "farmer_001", "device_id": None,
+     "detections": {"whiteflies": 0, "beetle": -1}},
+]
+
+
+def test_records_frame_explodes_positive_counts():
+    frame = records_frame(RECORDS)
+    assert len(frame) == 4
+    assert frame["record"].tolist() == [0, 0, 1, 1]
+    assert frame["count"].tolist() == [5, 2, 3, 1]
+    # 23:30 at -02:00 is the next UTC day
+    assert frame["day"].tolist() == ["2025-10-01", "2025-10-01", "2025-10-02", "2025-10-02"]
+    assert frame["device_id"].tolist() == ["1", "1", "1", "1"]
+
+
+def test_records_frame_empty_input():
+    frame = records_frame([])
+    assert frame.empty
+    assert list(frame.columns) == ["record", "timestamp", "day", "farmer_id", "device_id", "insect", "count"]
+
+
+def test_records_frame_malformed_detections():
+    records = [{"timestamp": "2025-10-01T00:00:00Z", "detections": "not json"},
+               {"timestamp": "2025-10-01T00:00:00Z", "detections": None},
+               {"timestamp": "2025-10-01T00:00:00Z", "detections": ["aphids"]},
+               {"timestamp": "2025-10-01T00:00:00Z", "detections": {"aphids": "many", "thrips": "4"}}]
+    frame = records_frame(records)
+    assert frame["record"].tolist() == [3]
+    assert frame["insect"].astype(str).tolist() == ["thrips"]
+    assert frame["count"].tolist() == [4]
+
+
+def test_records_frame_keeps_rows_with_bad_timestamps():
+    records = [{"timestamp": "yesterday", "detections": {"aphids": 3}},
+               {"detections": {"thrips": 1}},
+               {"timestamp": "2025-10-01T00:00:00Z", "detections": {"aphids": 1}}]
+    frame = records_frame(records)
+    assert frame["record"].tolist() == [0, 1, 2]
+    assert frame["day"].isna().tolist() == [True, True, False]
+    # Undated rows don't make it into the per-day rollup
+    assert to_rollup_rows(frame) == [
+        {"farmer_id": "", "device_id": "", "day": "2025-10-01", "insect": "aphids", "count": 1}]
+
+
+def test_records_frame_day_override():
+    frame = records_frame([{"timestamp": "garbage", "day": "2025-10-05T00:00:00", "detections": {"aphids": 1}}])
+    assert frame["day"].tolist() == ["2025-10-05"]
+
+
+def test_record_summaries():
+    labels, totals = record_summaries(records_frame(RECORDS), len(RECORDS))
+    assert labels == ["whiteflies:5, aphids:2", "aphids:3, thrips:1", "N/A"]
+    assert totals == [7, 4, 0]
+
+
+def test_record_summaries_empty_and_malformed():
+    assert record_summaries(records_frame([]), 0) == ([], [])
+    records = [{"timestamp": "2025-10-01T00:00:00Z", "detections": "{broken"}]
+    assert record_summaries(records_frame(records), 1) == (["N/A"], [0])
+
+
+def test_record_summaries_bad_timestamp_still_counted():
+    records = [{"timestamp": "not a date", "detections": {"aphids": 3}},
+               {"timestamp": None, "detections": {"thrips": 2, "aphids": 1}}]
+    assert record_summaries(records_frame(records), 2) == (["aphids:3", "thrips:2, aphids:1"], [3, 3])
+
+
+def test_daily_insect_series_zero_fills():
+    frame = records_frame(RECORDS)
+    days = ["2025-10-01", "2025-10-02", "2025-10-03"]
+    series = daily_insect_series(frame, ["whiteflies", "aphids", "fungus gnats"], days)
+    assert series == {"whiteflies": [5, 0, 0], "aphids": [2, 3, 0], "fungus gnats": [0, 0, 0]}
+
+
+def test_daily_insect_series_empty_and_undated():
+    assert daily_insect_series(records_frame([]), ["aphids"], ["2025-10-01"]) == {"aphids": [0]}
+    frame = records_frame([{"timestamp": "bad", "detections": {"aphids": 3}}])
+    assert daily_insect_series(frame, ["aphids"], ["2025-10-01"]) == {"aphids": [0]}
+    assert daily_totals(frame) == ([], [])
+
+
+def test_insect_totals():
+    totals = insect_totals(records_frame(RECORDS), ["beetle", "aphids"])
+    assert list(totals)[:2] == ["beetle", "aphids"]
+    assert totals == {"beetle": 0, "aphids": 5, "whiteflies": 5, "thrips": 1}
+
+
+def test_insect_totals_empty_and_bad_timestamps():
+    assert insect_totals(records_frame([]), ["aphids"]) == {"aphids": 0}
+    assert insect_totals(records_frame([]), ()) == {}
+    frame = records_frame([{"timestamp": "bad", "detections": {"aphids": "2"}}])
+    assert insect_totals(frame) == {"aphids": 2}
+
+
+def test_top_insect():
+    assert top_insect({"whiteflies": 5, "aphids": 7}) == ("aphids", 7)
+    assert top_insect({"whiteflies": 0, "aphids": 0}) == ("N/A", 0)
+    assert top_insect({}) == ("N/A", 0)
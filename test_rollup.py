@@ -0,0 +1,98 @@
+# test_rollup.py - Paging of the rollup / backfill readers against a stubbed Supabase client (run: python -m pytest)
+import pytest
+
+from rollup import PAGE_SIZE, load_rollup
+
+
+class StubQuery:
+    """Just enough of the postgrest select builder: eq/gte/gt filters, one order param, limit/offset"""
+
+    def __init__(self, client, rows):
+        self.client = client
+        self.rows = rows
+        self.filters = []
+        self.orders = []
+        self.size = None
+        self.start = 0
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row[column] == value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row[column] > value)
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append(column)
+        return self
+
+    def limit(self, size):
+        self.size = size
+        return self
+
+    def offset(self, start):
+        self.start = start
+        return self
+
+    def execute(self):
+        assert len(self.orders) == 1, "PostgREST only honours one order param"
+        keys = self.orders[0].split(",")
+        rows = sorted((row for row in self.rows if all(f(row) for f in self.filters)),
+                      key=lambda row: [row[key] for key in keys])
+        self.client.requests += 1
+        page = rows[self.start:self.start + min(self.size, self.client.max_rows)]
+        return type("Response", (), {"data": page})()
+
+
+class StubClient:
+    def __init__(self, tables, max_rows=1000):
+        self.tables = tables
+        self.max_rows = max_rows  # server-side cap, like PostgREST's db-max-rows
+        self.requests = 0
+
+    def table(self, name):
+        return StubQuery(self, self.tables[name])
+
+
+def rollup_table(days):
+    return [{"farmer_id": f"farmer_{i % 3:03d}", "device_id": str(i % 2), "day": f"2025-{i % 12 + 1:02d}-01",
+             "insect": f"insect_{i:05d}", "count": 1} for i in range(days)]
+
+
+def test_load_rollup_pages_past_row_cap():
+    client = StubClient({"insect_daily_rollup": rollup_table(2 * PAGE_SIZE + 5)})
+    rows = load_rollup(client)
+    assert len(rows) == 2 * PAGE_SIZE + 5
+    assert len({row["insect"] for row in rows}) == len(rows)
+    assert client.requests == 3
+
+
+def test_load_rollup_filters_every_page():
+    client = StubClient({"insect_daily_rollup": rollup_table(7 * PAGE_SIZE)})
+    rows = load_rollup(client, farmer_id="farmer_001", since_day="2025-06-01")
+    expected = [r for r in rollup_table(7 * PAGE_SIZE) if r["farmer_id"] == "farmer_001" and r["day"] >= "2025-06-01"]
+    assert len(expected) > PAGE_SIZE
+    assert sorted(r["insect"] for r in rows) == sorted(r["insect"] for r in expected)
+
+
+def test_load_rollup_unreadable_table():
+    assert load_rollup(StubClient({})) is None
+
+
+def test_fetch_all_records_pages_by_id():
+    backfill_rollup = pytest.importorskip("backfill_rollup")  # needs the supabase client package
+    records = [{"id": i, "timestamp": f"2025-10-{i % 28 + 1:02d}T00:00:00", "farmer_id": "farmer_001",
+                "device_id": "1", "detections": {"aphids": 1}} for i in range(1, 2 * backfill_rollup.BATCH_SIZE + 7)]
+    client = StubClient({"insect_records": records})
+    fetched = list(backfill_rollup.fetch_all_records(client))
+    assert [r["id"] for r in fetched] == [r["id"] for r in records]
+    since = list(backfill_rollup.fetch_all_records(client, since_day="2025-10-15"))
+    assert [r["id"] for r in since] == [r["id"] for r in records if r["timestamp"] >= "2025-10-15"]
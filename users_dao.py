@@ -0,0 +1,267 @@
+# users_dao.py - Shared SQLite access for users and devices (per-thread connections, WAL journal)
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from werkzeug.security import generate_password_hash
+
+# Compiled statements kept per connection; the helpers below use well under this many distinct queries
+CACHED_STATEMENTS = int(os.getenv("USERS_DB_CACHED_STATEMENTS", 64))
+BUSY_TIMEOUT = int(os.getenv("USERS_DB_TIMEOUT", 10))
+# Device-key cache: entries kept per worker, and how often (seconds) a worker checks whether another
+# worker regenerated / deleted a key - the longest a revoked key can keep working on another worker
+DEVICE_CACHE_SIZE = int(os.getenv("DEVICE_CACHE_SIZE", 1024))
+DEVICE_CACHE_CHECK = float(os.getenv("DEVICE_CACHE_CHECK", 5))
+
+
+class DeviceKeyCache:
+    """
+    LRU map of device_key -> device row for the upload routes. Revocations bump a counter in the
+    users.db meta table; every worker compares it with the value it last saw (at most once per
+    `check_interval` seconds) and drops its whole cache when another worker changed a key.
+    """
+
+    def __init__(self, maxsize=DEVICE_CACHE_SIZE, check_interval=DEVICE_CACHE_CHECK):
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = None
+        self.checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def needs_check(self):
+        return time.monotonic() - self.checked_at >= self.check_interval
+
+    def sync(self, version):
+        """Record the shared version just read from the database, clearing the cache if it moved"""
+        with self._lock:
+            if version != self.version:
+                if self.version is not None:
+                    self.invalidations += len(self._entries)
+                    self._entries.clear()
+                self.version = version
+            self.checked_at = time.monotonic()
+
+    def get(self, device_key):
+        with self._lock:
+            row = self._entries.get(device_key)
+            if row is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(device_key)
+            self.hits += 1
+            return row
+
+    def put(self, device_key, row, version):
+        with self._lock:
+            # A revocation may have landed while the row was being read; don't cache it under a newer version
+            if version != self.version:
+                return
+            self._entries[device_key] = row
+            self._entries.move_to_end(device_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, device_id):
+        with self._lock:
+            stale = [key for key, row in self._entries.items() if row[0] == device_id]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "check_interval_seconds": self.check_interval,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+class UsersDAO:
+    """
+    Users / devices queries for every route. Each thread (and each gunicorn worker, which forks after the
+    app is imported) keeps one open connection instead of connecting per query, so the device-key check
+    on every upload is a single indexed SELECT on an already prepared statement. The other users.db
+    stores (ImageIndex, IdempotencyStore, IngestQueue) run their queries on connection() too.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self.device_cache = DeviceKeyCache()
+        conn = self.connection()
+        # WAL lets readers run alongside the (rare) writer; NORMAL only fsyncs at checkpoints, which is
+        # safe in WAL mode - a power cut can lose the last commits but never corrupts the file.
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              username TEXT UNIQUE,
+              password_hash TEXT,
+              role TEXT,
+              farmer_id TEXT
+            );
+            """)
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS devices (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                device_name TEXT,
+                device_key TEXT UNIQUE,
+                farmer_id TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_devices_farmer_id ON devices (farmer_id, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_users_role ON users (role)")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(users)")]
+            if "version" not in columns:
+                conn.execute("ALTER TABLE users ADD COLUMN version INTEGER DEFAULT 0")
+            # Sessions carry a copy of the identity; any change to it (from the app or a manual edit) bumps the
+            # version so logged-in sessions pick it up on their next revalidation
+            conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS users_bump_version AFTER UPDATE OF role, farmer_id, password_hash ON users
+            BEGIN
+                UPDATE users SET version = COALESCE(version, 0) + 1 WHERE id = NEW.id;
+            END;
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('device_keys_version', 0)")
+
+    def connection(self):
+        """
+        This thread's connection, opened on first use (and again in a forked child). It stays open, so
+        callers commit with `with conn:` and fetch their rows instead of closing it.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, cached_statements=CACHED_STATEMENTS)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _one(self, sql, params=()):
+        # Close the cursor so the statement is reset and no read snapshot stays open between requests
+        cur = self.connection().execute(sql, params)
+        try:
+            return cur.fetchone()
+        finally:
+            cur.close()
+
+    def _all(self, sql, params=()):
+        return self.connection().execute(sql, params).fetchall()
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # Users
+    def create_sample_users(self):
+        for username, password, role, farmer_id in (("admin", "admin123", "admin", None),
+                                                    ("farmer1", "pass123", "farmer", "farmer_001")):
+            if not self.get_user(username):
+                self._insert_user(username, password, role, farmer_id)
+
+    def _insert_user(self, username, password, role, farmer_id):
+        conn = self.connection()
+        try:
+            with conn:
+                conn.execute("INSERT INTO users (username,password_hash,role,farmer_id) VALUES (?,?,?,?)",
+                             (username, generate_password_hash(password), role, farmer_id))
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def get_user(self, username):
+        return self._one("SELECT id, username, password_hash, role, farmer_id FROM users WHERE username=?",
+                         (username,))
+
+    def get_identity(self, user_id):
+        """(id, username, role, farmer_id, version) for session revalidation, None if the user was deleted"""
+        return self._one("SELECT id, username, role, farmer_id, COALESCE(version, 0) FROM users WHERE id=?",
+                         (user_id,))
+
+    def get_all_farmers(self):
+        return self._all("SELECT id, username, farmer_id FROM users WHERE role='farmer'")
+
+    def create_farmer(self, username, password, farmer_id):
+        return self._insert_user(username, password, "farmer", farmer_id)
+
+    # Devices
+    def create_device(self, device_name, farmer_id):
+        conn = self.connection()
+        device_key = uuid.uuid4().hex + uuid.uuid4().hex
+        with conn:
+            cur = conn.execute("INSERT INTO devices (device_name, device_key, farmer_id) VALUES (?,?,?)",
+                               (device_name, device_key, farmer_id))
+        return {"id": cur.lastrowid, "device_key": device_key}
+
+    def get_all_devices(self):
+        return self._all("SELECT id, device_name, device_key, farmer_id, created_at FROM devices "
+                         "ORDER BY created_at DESC")
+
+    def get_farmer_devices(self, farmer_id):
+        return self._all("SELECT id, device_name, device_key, farmer_id, created_at FROM devices "
+                         "WHERE farmer_id=? ORDER BY created_at DESC", (farmer_id,))
+
+    def _device_keys_version(self):
+        return self._one("SELECT value FROM meta WHERE name='device_keys_version'")[0]
+
+    def _revoke_device_keys(self, conn, device_id):
+        """Inside the caller's transaction: tell other workers to drop cached keys, and drop ours"""
+        conn.execute("UPDATE meta SET value = value + 1 WHERE name='device_keys_version'")
+        self.device_cache.discard(int(device_id))
+
+    def get_device_by_key(self, device_key):
+        """(id, device_name, device_key, farmer_id) of the device, served from the per-worker cache"""
+        if not device_key:
+            return None
+        cache = self.device_cache
+        if cache.needs_check():
+            cache.sync(self._device_keys_version())
+        row = cache.get(device_key)
+        if row is not None:
+            return row
+        version = cache.version
+        row = self._one("SELECT id, device_name, device_key, farmer_id FROM devices WHERE device_key=?",
+                        (device_key,))
+        # Unknown keys are not cached, so a newly created device works immediately on every worker
+        if row is not None:
+            cache.put(device_key, row, version)
+        return row
+
+    def get_device_by_id(self, device_id):
+        return self._one("SELECT id, device_name, device_key, farmer_id FROM devices WHERE id=?", (device_id,))
+
+    def regenerate_device_key(self, device_id):
+        conn = self.connection()
+        new_key = uuid.uuid4().hex + uuid.uuid4().hex
+        with conn:
+            conn.execute("UPDATE devices SET device_key=? WHERE id=?", (new_key, device_id))
+            self._revoke_device_keys(conn, device_id)
+        return new_key
+
+    def delete_device(self, device_id):
+        """Remove the device; its key stops authenticating uploads. Returns False if it didn't exist"""
+        conn = self.connection()
+        with conn:
+            cur = conn.execute("DELETE FROM devices WHERE id=?", (device_id,))
+            if cur.rowcount:
+                self._revoke_device_keys(conn, device_id)
+        return cur.rowcount > 0